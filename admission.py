@@ -0,0 +1,93 @@
+import collections
+import time
+
+import metrics
+
+# Admission control for the accept path.
+#
+# Every new connection is checked before it costs anything beyond the accept:
+#   - a ceiling on open connections per process,
+#   - a ceiling on connections that have not finished the handshake yet, so a
+#     flood of idle or half-open sockets cannot crowd out real players,
+#   - a per-IP token bucket limiting how fast one address may connect.
+# A refused connection gets a single REJECT frame with the reason and is closed
+# at once, so games already running never notice the pressure. Connections
+# that are let in must send NICK, RESUME or SPECTATE within HANDSHAKE_TIMEOUT,
+# counted from the accept however long routing takes, and that first frame
+# may carry at most HANDSHAKE_MAX_PAYLOAD bytes, so an unknown peer cannot make
+# the server buffer a full-size frame.
+#
+# The kernel listen backlog (LISTEN_BACKLOG in server.py) is kept large so a
+# burst waits in the queue instead of being dropped, and the server always
+# drains it: above the ceilings, connections are refused explicitly rather
+# than left to time out in the queue.
+
+MAX_CONNECTIONS = 20000         # Open connections per process
+MAX_PENDING_HANDSHAKES = 4096   # Connections still owing their first frame
+HANDSHAKE_TIMEOUT = 10          # Seconds a new connection has to send NICK or RESUME
+HANDSHAKE_MAX_PAYLOAD = 1024    # Bytes allowed in a frame before the connection has joined
+IP_RATE = 5                     # New connections per second per address, sustained
+IP_BURST = 20                   # New connections per address allowed back to back
+MAX_TRACKED_IPS = 10000         # Least recently seen addresses are forgotten beyond this many
+RATE_LIMIT_EXEMPT = {'127.0.0.1', '::1'}    # Local bots and load tests are not throttled
+
+# Reasons sent in REJECT frames
+SERVER_FULL = "Server is full. Please try again later."
+TOO_MANY_HANDSHAKES = "Server is busy. Please try again in a moment."
+TOO_FAST = "Too many connections from your address. Please wait a few seconds."
+
+class Admission:
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_pending=MAX_PENDING_HANDSHAKES, rate=IP_RATE,
+                 burst=IP_BURST, clock=time.monotonic):
+        self.max_connections = max_connections
+        self.max_pending = max_pending
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.connections = 0    # Admitted connections still open
+        self.pending = 0        # Admitted connections that have not joined yet
+        self.buckets = collections.OrderedDict()    # Maps addresses to [tokens, last refill time], oldest first
+
+    def check(self, address):
+        # Decide on a new connection; returns the reason to refuse it, or None to let it in.
+        if self.connections >= self.max_connections:
+            reason = SERVER_FULL
+        elif self.pending >= self.max_pending:
+            reason = TOO_MANY_HANDSHAKES
+        elif address not in RATE_LIMIT_EXEMPT and not self.take_token(address):
+            reason = TOO_FAST
+        else:
+            return None
+        metrics.REJECTED_CONNECTIONS.inc()
+        return reason
+
+    def take_token(self, address):
+        now = self.clock()
+        bucket = self.buckets.get(address)
+        if bucket is not None:
+            self.buckets.move_to_end(address)
+        else:
+            if len(self.buckets) >= MAX_TRACKED_IPS:
+                # Forget the address seen longest ago; it has most likely refilled anyway
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[address] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def opened(self):
+        self.connections += 1
+        self.pending += 1
+
+    def joined(self):
+        self.pending -= 1
+
+    def closed(self, joined):
+        self.connections -= 1
+        if not joined:
+            self.pending -= 1
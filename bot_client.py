@@ -0,0 +1,150 @@
+import asyncio
+import json
+import random
+import re
+import time
+
+import protocol
+from prefetch import PrefetchCache
+
+# Server connection details
+HOST = '127.0.0.1'
+PORT = 5002
+READ_SIZE = 4096
+
+QUESTION_PATTERN = re.compile(r"Question \d+: (.*)\n")
+CHOICES = ['A', 'B', 'C', 'D']
+
+def load_answer_key(path='questions.json'):
+    # Map question text to its correct choice so bots can answer on purpose.
+    with open(path, 'r', encoding='utf-8') as file:
+        return {q['question']: q['answer'] for q in json.load(file)}
+
+class BotClient:
+    # Headless player that speaks the same protocol as gui.py.
+    #
+    # A bot sends its nickname, answers every question after a random think time
+    # (correctly with probability `accuracy` when it knows the answer) and records
+    # timings along the way:
+    #   connect_time        seconds to establish the TCP connection
+    #   question_latencies  server send time of the REVEAL to its receipt, from the TIMESTAMP frame
+    #   feedback_latencies  answer sent to FEEDBACK received
+
+    def __init__(self, nickname, host=HOST, port=PORT, answer_key=None, accuracy=1.0,
+                 think_time=(0.5, 2.0), rng=None):
+        self.nickname = nickname
+        self.host = host
+        self.port = port
+        self.answer_key = answer_key or {}
+        self.accuracy = accuracy
+        self.think_time = think_time
+        self.rng = rng or random.Random()
+
+        self.reader = None
+        self.writer = None
+        self.sent_at = None         # Server time carried by the last TIMESTAMP frame
+        self.answered_at = None     # perf_counter() when the open question was answered
+        self.answer_timer = None
+        self.prefetched = PrefetchCache()
+
+        # What the bot has seen
+        self.status = None
+        self.scoreboard = None
+        self.rank = None
+        self.final = None
+        self.rejected = None        # Reason given by admission control, if the server refused us
+        self.questions = 0
+        self.correct = 0
+        self.frames = 0
+
+        # Timings in seconds
+        self.connect_time = None
+        self.question_latencies = []
+        self.feedback_latencies = []
+
+    async def connect(self):
+        start = time.perf_counter()
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.connect_time = time.perf_counter() - start
+        self.send(protocol.NICK, self.nickname)
+
+    def send(self, msg_type, payload):
+        self.writer.write(protocol.encode(msg_type, payload))
+
+    async def play(self):
+        # Read until the final scores arrive or the server hangs up.
+        decoder = protocol.FrameDecoder()
+        try:
+            while self.final is None and self.rejected is None:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+                received = time.time()
+                for msg_type, payload in decoder.feed(data):
+                    self.handle_message(msg_type, payload, received)
+        finally:
+            self.close()
+
+    async def run(self):
+        await self.connect()
+        await self.play()
+        return self
+
+    def close(self):
+        if self.answer_timer is not None:
+            self.answer_timer.cancel()
+            self.answer_timer = None
+        if self.writer is not None:
+            self.writer.close()
+
+    def handle_message(self, msg_type, payload, received):
+        self.frames += 1
+        if msg_type == protocol.TIMESTAMP:
+            self.sent_at = float(payload)
+        elif msg_type == protocol.PING:
+            self.send(protocol.PONG, f"{payload} {time.time():.6f}")
+        elif msg_type == protocol.PREFETCH:
+            self.prefetched.store(payload)
+        elif msg_type == protocol.REVEAL:
+            question = self.prefetched.open(payload)
+            if question is None:
+                return
+            self.questions += 1
+            if self.sent_at is not None:
+                self.question_latencies.append(received - self.sent_at)
+                self.sent_at = None
+            self.answered_at = None
+            delay = self.rng.uniform(*self.think_time)
+            loop = asyncio.get_running_loop()
+            self.answer_timer = loop.call_later(delay, self.answer, self.choose(question[0]))
+        elif msg_type == protocol.FEEDBACK:
+            if self.answered_at is not None:
+                self.feedback_latencies.append(time.perf_counter() - self.answered_at)
+                self.answered_at = None
+            if payload == "CORRECT":
+                self.correct += 1
+        elif msg_type == protocol.SCORE:
+            self.scoreboard = payload
+        elif msg_type == protocol.RANK:
+            self.rank = payload
+        elif msg_type == protocol.STATUS:
+            self.status = payload
+        elif msg_type == protocol.FINAL:
+            self.final = payload
+        elif msg_type == protocol.REJECT:
+            self.rejected = payload
+
+    def choose(self, question_text):
+        # Pick the right answer with probability `accuracy`, otherwise guess.
+        match = QUESTION_PATTERN.search(question_text)
+        correct = self.answer_key.get(match.group(1)) if match else None
+        if correct and self.rng.random() < self.accuracy:
+            return correct
+        return self.rng.choice([c for c in CHOICES if c != correct])
+
+    def answer(self, choice):
+        self.answer_timer = None
+        if self.writer is None or self.writer.is_closing():
+            return
+        self.answered_at = time.perf_counter()
+        self.send(protocol.ANSWER, choice)
@@ -0,0 +1,75 @@
+import metrics
+
+# Non-blocking fan-out of pre-encoded frames to many clients.
+#
+# Each connection's asyncio transport already owns a write buffer that the event
+# loop drains whenever the socket is writable, so a write never blocks the game.
+# What it lacks is a bound: a stalled client would let that buffer grow forever.
+# ClientConnection puts a ceiling on it and evicts clients that cannot keep up.
+
+SOFT_BACKLOG = 64 * 1024    # Above this many queued bytes, droppable messages are skipped
+MAX_BACKLOG = 512 * 1024    # Above this many queued bytes, the client is evicted
+
+log = print     # rooms.py points this at its logger, so evictions obey rooms.LOG_EVENTS
+
+class ClientConnection:
+    # One client socket with a bounded, non-blocking send queue.
+
+    def __init__(self, writer, soft_backlog=SOFT_BACKLOG, max_backlog=MAX_BACKLOG):
+        self.writer = writer
+        self.transport = writer.transport
+        self.peer = writer.get_extra_info("peername")
+        self.soft_backlog = soft_backlog
+        self.max_backlog = max_backlog
+        self.dropped = 0        # Droppable messages skipped because the client lagged
+        self.evicted = False
+        self.closed = False
+        self.link = None        # latency.LinkStats once the client joined
+
+    def queue_depth(self):
+        # Bytes accepted for this client that the kernel has not taken yet.
+        if self.closed:
+            return 0
+        return self.transport.get_write_buffer_size()
+
+    def send(self, data, droppable=False):
+        # Queue bytes without blocking. Returns False if they were not queued.
+        if self.closed:
+            return False
+        depth = self.transport.get_write_buffer_size()
+        if depth + len(data) > self.max_backlog:
+            log(f"[!] Evicting slow client {self.peer}: {depth} bytes backlog.")
+            metrics.EVICTIONS.inc()
+            self.evicted = True
+            self.close()
+            return False
+        if droppable and depth > self.soft_backlog:
+            # Stale scoreboards are replaced by the next one anyway
+            self.dropped += 1
+            metrics.DROPPED_MESSAGES.inc()
+            return False
+        self.transport.write(data)
+        metrics.BYTES_SENT.inc(len(data))
+        return True
+
+    def close(self):
+        # Close the socket; an evicted client's unsent backlog is thrown away.
+        if self.closed:
+            return
+        self.closed = True
+        if self.evicted:
+            self.transport.abort()
+        else:
+            self.writer.close()
+
+def fan_out(connections, data, droppable=False):
+    # Queue one encoded frame on every connection; returns the clients that failed.
+    failed = []
+    for conn in connections:
+        if not conn.send(data, droppable) and conn.closed:
+            failed.append(conn)
+    return failed
+
+def queue_depths(connections):
+    # Snapshot of queued bytes per connection, for monitoring slow consumers.
+    return {conn.peer: conn.queue_depth() for conn in connections}
@@ -1,11 +1,34 @@
+import json
+import math
+import queue
 import socket
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox
 
+import protocol
+from prefetch import PrefetchCache
+
 # Server connection details
 HOST = '127.0.0.1'
 PORT = 5002
+QUESTION_TIME = 20          # Seconds to answer, matching the server's limit
+
+# After a dropped connection the client reconnects and resumes with its session token
+RECONNECT_ATTEMPTS = 5
+RECONNECT_DELAY = 1         # Seconds between attempts
+CONNECT_TIMEOUT = 3
+
+# The network thread never touches Tk; it queues messages that the Tk main
+# loop drains in batches every POLL_INTERVAL_MS milliseconds.
+POLL_INTERVAL_MS = 30
+MAX_MESSAGES_PER_DRAIN = 200
+
+# Local notices queued by the network thread next to server messages
+UI_ERROR = "error"
+UI_RECONNECTING = "reconnecting"
+UI_CONNECT_FAILED = "connect failed"
 
 # UI theme settings
 UI = {
@@ -24,298 +47,402 @@ class QuizClientGUI:
         self.master.title("Quiz Game")
         self.master.geometry("640x480")
         self.master.configure(bg=UI["bg"])
-        
-        # Variable for tracking disconnect overlay
-        self.disconnect_overlay = None
-        
-        # Create client socket and connect to server
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.client.connect((HOST, PORT))
-        except ConnectionRefusedError:
-            messagebox.showerror("Connection Error", "Could not connect to the server. Please ensure the server is running.")
-            self.master.destroy()
-            return
-        except socket.gaierror:
-            messagebox.showerror("Connection Error", "Invalid hostname or IP address.")
-            self.master.destroy()
-            return
-        except Exception as e:
-            messagebox.showerror("Connection Error", f"Failed to connect: {str(e)}")
-            self.master.destroy()
-            return
+
+        # Connected when the player joins; the server drops connections that stay silent
+        self.client = None
+        self.send_lock = threading.Lock()   # Both threads send: answers from Tk, pongs from the network thread
 
         # Variables to manage state
         self.nickname = ""
+        self.session_token = None   # Issued by the server at join, used to resume after a drop
         self.current_question = tk.StringVar()
         self.scoreboard_text = tk.StringVar()
+        self.rank_text = tk.StringVar()
         self.timer_text = tk.StringVar()
+        self.waiting_text = tk.StringVar()
+        self.final_text = tk.StringVar()
+        self.submitted_text = tk.StringVar()
         self.answer_buttons = []
         self.answered = False
         self.timer_running = False
         self.timer_id = None
+        self.submitted_id = None
         self.last_feedback = None
+        self.prefetched = PrefetchCache()   # Sealed upcoming questions, opened by REVEAL frames
+
+        # Messages from the network thread, drained on the Tk thread
+        self.inbox = queue.Queue()
+
+        # Every screen is built once and only shown, hidden and updated afterwards
+        self.screens = {}
+        self.current_screen = None
+        self.build_screens()
 
         # Show nickname input screen
         self.nickname_prompt()
+        self.master.after(POLL_INTERVAL_MS, self.process_inbox)
 
-    def nickname_prompt(self):
-        # Display screen to ask the user for a nickname.
-        self.clear_window()
-        tk.Label(self.master, text="Welcome to Quizzie!\n\n What's your name?", 
+    def build_screens(self):
+        # Create the widgets for the nickname, waiting, question and final screens.
+        nickname = tk.Frame(self.master, bg=UI["bg"])
+        tk.Label(nickname, text="Welcome to Quizzie!\n\n What's your name?",
                  font=(UI["font"], 20), bg=UI["bg"], fg=UI["fg"]).pack(pady=40)
-        self.entry = tk.Entry(self.master, font=(UI["font"], 16), width=25, bg="white")
+        self.entry = tk.Entry(nickname, font=(UI["font"], 16), width=25, bg="white")
         self.entry.pack(pady=15)
-        tk.Button(self.master, text="Join Game", font=(UI["font"], 14), bg=UI["button"], fg="black",
+        tk.Button(nickname, text="Join Game", font=(UI["font"], 14), bg=UI["button"], fg="black",
                   command=self.send_nickname).pack(pady=20)
+        self.screens["nickname"] = nickname
+
+        waiting = tk.Frame(self.master, bg=UI["bg"])
+        tk.Label(waiting, textvariable=self.waiting_text, font=(UI["font"], 18),
+                 bg=UI["bg"], fg=UI["accent"]).pack(pady=140)
+        self.screens["waiting"] = waiting
+
+        question = tk.Frame(self.master, bg=UI["bg"])
+        tk.Label(question, textvariable=self.current_question, wraplength=600,
+                 font=(UI["font"], 16), bg=UI["bg"], fg=UI["fg"]).pack(pady=30)
+        tk.Label(question, textvariable=self.timer_text, font=(UI["font"], 14),
+                 bg=UI["bg"], fg=UI["danger"]).pack()
+
+        # Answer buttons
+        btn_frame = tk.Frame(question, bg=UI["bg"])
+        btn_frame.pack(pady=20)
+        for ch in ['A', 'B', 'C', 'D']:
+            btn = tk.Button(
+                btn_frame,
+                text=ch,
+                width=12, height=3,
+                font=(UI["font"], 16),
+                relief='raised', bd=2,
+                command=lambda c=ch: self.send_answer(c),
+                bg=UI["button"], fg="black",
+                activebackground="#1565C0", activeforeground="white",
+                cursor="hand2"
+            )
+            btn.pack(side=tk.LEFT, padx=15, pady=10)
+            self.answer_buttons.append(btn)
+
+        tk.Label(question, textvariable=self.submitted_text, font=(UI["font"], 12),
+                 bg=UI["bg"], fg=UI["accent"]).pack(pady=5)
+
+        # Scoreboard
+        tk.Label(question, textvariable=self.scoreboard_text, font=(UI["font"], 14),
+                 bg=UI["bg"], fg=UI["success"]).pack(pady=15)
+        tk.Label(question, textvariable=self.rank_text, font=(UI["font"], 12, "bold"),
+                 bg=UI["bg"], fg=UI["fg"]).pack()
+        self.screens["question"] = question
+
+        final = tk.Frame(self.master, bg=UI["bg"])
+        tk.Label(final, textvariable=self.final_text, font=(UI["font"], 16),
+                 bg=UI["bg"], fg=UI["fg"], wraplength=600).pack(pady=(100, 10))
+        tk.Label(final, textvariable=self.rank_text, font=(UI["font"], 14, "bold"),
+                 bg=UI["bg"], fg=UI["accent"]).pack()
+        self.screens["final"] = final
+
+        # Overlay shown on top of any screen while a player is disconnected
+        self.disconnect_overlay = tk.Frame(self.master, bg="#333333", bd=2)
+        self.disconnect_text = tk.StringVar()
+        tk.Label(
+            self.disconnect_overlay,
+            textvariable=self.disconnect_text,
+            font=(UI["font"], 14, "bold"),
+            bg="#333333",
+            fg="#ffffff",
+            wraplength=500
+        ).pack(expand=True, fill=tk.BOTH, padx=20, pady=20)
+
+    def show_screen(self, name):
+        # Swap the visible screen; switching to the one already shown is a no-op.
+        if self.current_screen == name:
+            return
+        if self.current_screen is not None:
+            self.screens[self.current_screen].pack_forget()
+        self.screens[name].pack(expand=True, fill=tk.BOTH)
+        self.current_screen = name
+
+    def nickname_prompt(self):
+        # Display screen to ask the user for a nickname.
+        self.show_screen("nickname")
+        self.entry.focus_set()
+
+    def connect(self):
+        # Network thread: open the connection and send the nickname; returns False after queueing why it failed.
+        try:
+            sock = socket.create_connection((HOST, PORT), timeout=CONNECT_TIMEOUT)
+            sock.settimeout(None)
+        except ConnectionRefusedError:
+            reason = "Could not connect to the server. Please ensure the server is running."
+        except socket.gaierror:
+            reason = "Invalid hostname or IP address."
+        except OSError as e:
+            reason = f"Failed to connect: {str(e)}"
+        else:
+            with self.send_lock:
+                self.client = sock
+            try:
+                self.send(protocol.NICK, self.nickname)
+                return True
+            except OSError:
+                sock.close()
+                reason = "Lost connection to the server while sending nickname."
+        self.inbox.put((UI_CONNECT_FAILED, ("Connection Error", reason)))
+        return False
 
     def send_nickname(self):
-        # Send the nickname to the server and start receiving messages.
+        # Join with the entered nickname. Connecting can take up to CONNECT_TIMEOUT, so it runs
+        # on the network thread, which then stays to receive messages.
         self.nickname = self.entry.get()
         if self.nickname:
-            try:
-                self.client.sendall(self.nickname.encode())
-                threading.Thread(target=self.receive_messages, daemon=True).start()
-                self.show_waiting_message("\u23f3 Waiting for players...")
-            except ConnectionError:
-                messagebox.showerror("Connection Error", "Lost connection to the server while sending nickname.")
-                self.master.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"An error occurred while sending nickname: {str(e)}")
+            self.show_waiting_message("\u23f3 Connecting...")
+            threading.Thread(target=self.run_connection, daemon=True).start()
         else:
             messagebox.showwarning("Nickname Missing", "Please enter a nickname to join.")
 
+    def run_connection(self):
+        # Network thread: connect and join, then receive until the connection is gone for good.
+        if self.connect():
+            self.receive_messages()
+
     def show_waiting_message(self, message):
         # Display a waiting message (e.g. waiting for players).
-        try:
-            self.clear_window()
-            self.waiting_label = tk.Label(self.master, text=message, font=(UI["font"], 18), bg=UI["bg"], fg=UI["accent"])
-            self.waiting_label.pack(pady=140)
-        except Exception as e:
-            messagebox.showerror("UI Error", f"Failed to display waiting message: {str(e)}")
-
-    def show_question(self, text):
-        # Display a question and answer buttons.
-        try:
-            self.clear_window()
-            self.answered = False
-            self.timer_running = True
-
-            tk.Label(self.master, textvariable=self.current_question, wraplength=600,
-                     font=(UI["font"], 16), bg=UI["bg"], fg=UI["fg"]).pack(pady=30)
-            self.current_question.set(text)
-
-            tk.Label(self.master, textvariable=self.timer_text, font=(UI["font"], 14),
-                     bg=UI["bg"], fg=UI["danger"]).pack()
-
-            # Create answer buttons
-            btn_frame = tk.Frame(self.master, bg=UI["bg"])
-            btn_frame.pack(pady=20)
-
-            self.answer_buttons = []
-            for ch in ['A', 'B', 'C', 'D']:
-                btn = tk.Button(
-                    btn_frame,
-                    text=ch,
-                    width=12, height=3,
-                    font=(UI["font"], 16),
-                    relief='raised', bd=2,
-                    command=lambda c=ch: self.send_answer(c),
-                    bg=UI["button"], fg="black",
-                    activebackground="#1565C0", activeforeground="white",
-                    cursor="hand2"
-                )
-                btn.pack(side=tk.LEFT, padx=15, pady=10)
-                self.answer_buttons.append(btn)
-
-            # Scoreboard
-            tk.Label(self.master, textvariable=self.scoreboard_text, font=(UI["font"], 14),
-                     bg=UI["bg"], fg=UI["success"]).pack(pady=15)
-
-            self.start_timer(20)
-        except Exception as e:
-            messagebox.showerror("UI Error", f"Failed to display question: {str(e)}")
+        self.stop_timer()
+        self.waiting_text.set(message)
+        self.show_screen("waiting")
+
+    def show_question(self, text, seconds=QUESTION_TIME):
+        # Display a question and reset the answer buttons for it.
+        self.stop_timer()
+        self.answered = False
+        self.current_question.set(text)
+        self.clear_submitted_message()
+        for btn in self.answer_buttons:
+            btn.config(state=tk.NORMAL, bg=UI["button"])
+        self.show_screen("question")
+        self.timer_running = True
+        self.start_timer(seconds)
 
     def start_timer(self, seconds):
         # Start countdown timer for answering the question.
-        try:
-            if self.timer_running:
-                if seconds > 0:
-                    self.timer_text.set(f"\u23f1 Time left: {seconds} sec")
-                    self.timer_id = self.master.after(1000, self.start_timer, seconds - 1)
-                else:
-                    self.timer_text.set("\u274c Time's up!")
-                    self.disable_buttons()
-        except Exception as e:
-            print(f"Timer error: {str(e)}")  # Using print since messagebox might disrupt the UI flow
+        if self.timer_running:
+            if seconds > 0:
+                self.timer_text.set(f"\u23f1 Time left: {seconds} sec")
+                self.timer_id = self.master.after(1000, self.start_timer, seconds - 1)
+            else:
+                self.timer_id = None
+                self.timer_text.set("\u274c Time's up!")
+                self.disable_buttons()
+
+    def stop_timer(self):
+        # Cancel a running countdown.
+        self.timer_running = False
+        if self.timer_id:
+            self.master.after_cancel(self.timer_id)
+            self.timer_id = None
+
+    def send(self, msg_type, payload):
+        # Send one frame; the lock keeps frames from the two threads from interleaving.
+        with self.send_lock:
+            self.client.sendall(protocol.encode(msg_type, payload))
 
     def send_answer(self, choice):
         # Send selected answer to the server.
         if not self.answered:
             try:
-                self.client.sendall(choice.encode())
+                self.send(protocol.ANSWER, choice)
                 self.answered = True
                 self.disable_buttons()
-                
+
                 # Show a temporary message that your answer has been submitted
                 self.show_answer_submitted_message()
-                
-            except ConnectionResetError:
-                messagebox.showerror("Connection Error", "Connection was reset by the server.")
-                self.master.destroy()
-            except ConnectionAbortedError:
-                messagebox.showerror("Connection Error", "Connection was aborted.")
+
+            except OSError as e:
+                if self.session_token:
+                    # The network thread is reconnecting; the snapshot will bring this question back
+                    return
+                messagebox.showerror("Connection Error", f"Could not send answer: {str(e)}")
                 self.master.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not send answer: {str(e)}")
-                
+
     def show_answer_submitted_message(self):
         # Show a temporary message that answer was submitted and we're waiting for others
-        try:
-            msg_frame = tk.Frame(self.master, bg=UI["bg"])
-            msg_frame.pack(pady=5)
-            
-            submitted_label = tk.Label(
-                msg_frame, 
-                text="Answer submitted! Waiting for other players...",
-                font=(UI["font"], 12),
-                bg=UI["bg"],
-                fg=UI["accent"]
-            )
-            submitted_label.pack(pady=10)
-            
-            # Auto-destroy after 3 seconds if no other response comes from server
-            self.master.after(3000, lambda: submitted_label.destroy() if submitted_label.winfo_exists() else None)
-        except Exception as e:
-            print(f"Error showing answer submitted message: {str(e)}")
+        self.clear_submitted_message()
+        self.submitted_text.set("Answer submitted! Waiting for other players...")
+        # Clear it after 3 seconds if no other response comes from server
+        self.submitted_id = self.master.after(3000, self.clear_submitted_message)
+
+    def clear_submitted_message(self):
+        if self.submitted_id:
+            self.master.after_cancel(self.submitted_id)
+            self.submitted_id = None
+        self.submitted_text.set("")
 
     def disable_buttons(self):
         # Disable all answer buttons and stop the timer.
-        try:
-            self.timer_running = False
-            if self.timer_id:
-                self.master.after_cancel(self.timer_id)
-                self.timer_id = None
-            for btn in self.answer_buttons:
-                btn.config(state=tk.DISABLED)
-        except Exception as e:
-            print(f"Error disabling buttons: {str(e)}")  # Using print to avoid disrupting UI
+        self.stop_timer()
+        for btn in self.answer_buttons:
+            btn.config(state=tk.DISABLED)
 
     def color_buttons(self, is_correct):
         # Change the color of buttons based on correctness.
-        try:
-            for btn in self.answer_buttons:
-                if btn['state'] == tk.DISABLED:
-                    btn.config(bg=UI["success"] if is_correct else UI["danger"])
-            self.master.update()
-        except Exception as e:
-            print(f"Error coloring buttons: {str(e)}")  # Using print to avoid disrupting UI
+        for btn in self.answer_buttons:
+            if btn['state'] == tk.DISABLED:
+                btn.config(bg=UI["success"] if is_correct else UI["danger"])
 
     def animate_score(self):
         # Visual animation when score changes (green for correct, red for incorrect)
-        try:
-            if self.answered:
-                if self.last_feedback == "CORRECT":
-                    self.master.after(100, lambda: self.master.config(bg="#e8f5e9"))  # Light green
-                    self.master.after(400, lambda: self.master.config(bg=UI["bg"]))
-                else:
-                    self.master.after(100, lambda: self.master.config(bg="#ffebee"))  # Light red
-                    self.master.after(400, lambda: self.master.config(bg=UI["bg"]))
-        except Exception as e:
-            print(f"Animation error: {str(e)}")  # Using print to avoid disrupting UI
+        if self.answered:
+            if self.last_feedback == "CORRECT":
+                self.master.after(100, lambda: self.master.config(bg="#e8f5e9"))  # Light green
+            else:
+                self.master.after(100, lambda: self.master.config(bg="#ffebee"))  # Light red
+            self.master.after(400, lambda: self.master.config(bg=UI["bg"]))
 
     def receive_messages(self):
-        # Continuously receive and handle messages from the server.
+        # Network thread: read frames from the socket and queue them for the Tk thread.
+        decoder = protocol.FrameDecoder()
         while True:
             try:
-                msg = self.client.recv(4096).decode()
-                if not msg:  # Connection closed by server
+                data = self.client.recv(4096)
+                if not data:  # Connection closed by server
                     raise ConnectionError("Server closed the connection")
-                
-                if msg.startswith("QUESTION||"):
-                    self.show_question(msg.replace("QUESTION||", ""))
-                elif msg.startswith("SCORE||"):
-                    self.scoreboard_text.set(msg.replace("SCORE||", ""))
-                elif msg.startswith("FINAL||"):
-                    self.clear_window()
-                    tk.Label(self.master, text=msg.replace("FINAL||", ""), font=(UI["font"], 16),
-                             bg=UI["bg"], fg=UI["fg"], wraplength=600).pack(pady=100)
-                elif msg.startswith("STATUS||"):
-                    self.show_waiting_message(msg.replace("STATUS||", ""))
-                elif msg.startswith("WAIT_DISCONNECT||"):
-                    # Show a message that we're waiting because a player disconnected
-                    # This could be an overlay on the current question screen
-                    self.show_disconnect_wait_message(msg.replace("WAIT_DISCONNECT||", ""))
-                elif msg.startswith("RESUME_AFTER_DISCONNECT||"):
-                    # Remove the disconnect wait message if it exists
-                    self.remove_disconnect_wait_message()
-                elif msg.startswith("FEEDBACK||"):
-                    status = msg.replace("FEEDBACK||", "")
-                    self.last_feedback = status  # Store the feedback status
-                    self.color_buttons(is_correct=(status == "CORRECT"))
-                    self.animate_score()
-            except ConnectionResetError:
-                self.master.after(0, lambda: messagebox.showerror("Disconnected", "Connection was reset by the server."))
+
+                # One read may hold several frames, or only part of one
+                for msg_type, payload in decoder.feed(data):
+                    if msg_type == protocol.PING:
+                        # Answer here rather than after the next inbox poll, or the poll delay counts as RTT
+                        self.send(protocol.PONG, f"{payload} {time.time():.6f}")
+                        continue
+                    self.inbox.put((msg_type, payload))
+                    if msg_type == protocol.REJECT:
+                        # Refused by the server; it hangs up next, so do not reconnect
+                        return
+            except OSError as e:
+                # Covers resets, aborts and timeouts; try to take our seat back
+                if self.reconnect():
+                    decoder = protocol.FrameDecoder()
+                    continue
+                self.inbox.put((UI_ERROR, ("Disconnected", f"Lost connection to server: {str(e)}")))
                 break
-            except ConnectionAbortedError:
-                self.master.after(0, lambda: messagebox.showerror("Disconnected", "Connection was aborted."))
+            except Exception as e:
+                self.inbox.put((UI_ERROR, ("Disconnected", f"Lost connection to server: {str(e)}")))
                 break
-            except socket.timeout:
-                self.master.after(0, lambda: messagebox.showwarning("Timeout", "Connection timed out. Trying to reconnect..."))
+
+    def reconnect(self):
+        # Network thread: open a new connection and send the resume token; False if that fails.
+        if not self.session_token:
+            return False
+        self.inbox.put((UI_RECONNECTING, "\u26a0 Connection lost. Reconnecting..."))
+        for _ in range(RECONNECT_ATTEMPTS):
+            try:
+                sock = socket.create_connection((HOST, PORT), timeout=CONNECT_TIMEOUT)
+                sock.settimeout(None)
+                sock.sendall(protocol.encode(protocol.RESUME, self.session_token))
+            except OSError:
+                time.sleep(RECONNECT_DELAY)
+                continue
+            # An answer being sent from the Tk thread finishes on the old socket first
+            with self.send_lock:
+                old, self.client = self.client, sock
+            old.close()
+            return True
+        return False
+
+    def process_inbox(self):
+        # Tk thread: apply up to MAX_MESSAGES_PER_DRAIN queued messages, then poll again.
+        try:
+            for _ in range(MAX_MESSAGES_PER_DRAIN):
                 try:
-                    self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.client.connect((HOST, PORT))
-                    if self.nickname:
-                        self.client.sendall(self.nickname.encode())
-                except Exception:
-                    self.master.after(0, lambda: messagebox.showerror("Reconnection Failed", "Could not reconnect to server."))
+                    msg_type, payload = self.inbox.get_nowait()
+                except queue.Empty:
                     break
-            except Exception as e:
-                self.master.after(0, lambda: messagebox.showerror("Disconnected", f"Lost connection to server: {str(e)}"))
-                break
+                try:
+                    self.handle_message(msg_type, payload)
+                except tk.TclError as e:
+                    print(f"UI error handling message {msg_type}: {str(e)}")
+        finally:
+            # Keep polling even if one message failed, unless the window is gone
+            try:
+                self.master.after(POLL_INTERVAL_MS, self.process_inbox)
+            except tk.TclError:
+                pass
+
+    def handle_message(self, msg_type, payload):
+        # Dispatch one decoded server message to the matching screen update.
+        if msg_type == protocol.PREFETCH:
+            self.prefetched.store(payload)
+        elif msg_type == protocol.REVEAL:
+            question = self.prefetched.open(payload)
+            if question is not None:
+                text, seconds = question
+                self.show_question(text, math.ceil(seconds))
+        elif msg_type == protocol.SCORE:
+            self.scoreboard_text.set(payload)
+        elif msg_type == protocol.RANK:
+            self.rank_text.set(payload)
+        elif msg_type == protocol.FINAL:
+            self.stop_timer()
+            self.prefetched.clear()
+            self.final_text.set(payload)
+            self.show_screen("final")
+        elif msg_type == protocol.STATUS:
+            self.show_waiting_message(payload)
+        elif msg_type == protocol.WAIT_DISCONNECT:
+            # Show a message that we're waiting because a player disconnected
+            self.show_disconnect_wait_message(payload)
+        elif msg_type == protocol.RESUME_AFTER_DISCONNECT:
+            self.remove_disconnect_wait_message()
+        elif msg_type == protocol.FEEDBACK:
+            self.last_feedback = payload  # Store the feedback status
+            self.color_buttons(is_correct=(payload == "CORRECT"))
+            self.animate_score()
+        elif msg_type == protocol.SESSION:
+            if payload:
+                self.session_token = payload
+            else:
+                # Our seat was given up; join a new game under the same name
+                self.session_token = None
+                self.remove_disconnect_wait_message()
+                self.send(protocol.NICK, self.nickname)
+                self.show_waiting_message("\u23f3 Your game moved on. Joining a new one...")
+        elif msg_type == protocol.SNAPSHOT:
+            self.apply_snapshot(json.loads(payload))
+        elif msg_type == protocol.REJECT:
+            self.session_token = None
+            self.client.close()
+            messagebox.showwarning("Server Busy", payload)
+            self.nickname_prompt()
+        elif msg_type == UI_RECONNECTING:
+            self.show_disconnect_wait_message(payload)
+        elif msg_type == UI_ERROR:
+            messagebox.showerror(*payload)
+        elif msg_type == UI_CONNECT_FAILED:
+            messagebox.showerror(*payload)
+            self.nickname_prompt()
+
+    def apply_snapshot(self, snapshot):
+        # Restore the screen after a resume: the open question with the time left, or whatever came after.
+        self.remove_disconnect_wait_message()
+        self.rank_text.set(snapshot.get("rank") or "")
+        if snapshot.get("final"):
+            self.stop_timer()
+            self.final_text.set(snapshot["final"])
+            self.show_screen("final")
+        elif snapshot.get("question"):
+            self.show_question(snapshot["question"], math.ceil(snapshot["remaining"]))
+            if snapshot.get("answered"):
+                self.answered = True
+                self.disable_buttons()
+        else:
+            self.show_waiting_message("\u2705 Reconnected. Waiting for the next question...")
 
     def show_disconnect_wait_message(self, message):
-        # Display an overlay message when a player disconnects
-        try:
-            # Create a semi-transparent overlay frame
-            self.disconnect_overlay = tk.Frame(self.master, bg="#333333", bd=2)
-            self.disconnect_overlay.place(relx=0.5, rely=0.5, relwidth=0.8, relheight=0.3, anchor="center")
-            
-            # Create the message with the player's name
-            wait_msg = tk.Label(
-                self.disconnect_overlay,
-                text=message,
-                font=(UI["font"], 14, "bold"),
-                bg="#333333",
-                fg="#ffffff",
-                wraplength=500
-            )
-            wait_msg.pack(expand=True, fill=tk.BOTH, padx=20, pady=20)
-            
-        except Exception as e:
-            print(f"Error showing disconnect message: {str(e)}")
-    
+        # Display the overlay message when a player disconnects
+        self.disconnect_text.set(message)
+        self.disconnect_overlay.place(relx=0.5, rely=0.5, relwidth=0.8, relheight=0.3, anchor="center")
+        self.disconnect_overlay.lift()
+
     def remove_disconnect_wait_message(self):
-        # Remove the disconnect wait message overlay
-        try:
-            if self.disconnect_overlay:
-                self.disconnect_overlay.destroy()
-                self.disconnect_overlay = None
-        except Exception as e:
-            print(f"Error removing disconnect message: {str(e)}")
-    
-    def clear_window(self):
-        # Remove all widgets from the window and reset timer state.
-        try:
-            for widget in self.master.winfo_children():
-                widget.destroy()
-            self.disconnect_overlay = None  # Reset overlay reference
-            self.timer_running = False
-            if self.timer_id:
-                self.master.after_cancel(self.timer_id)
-                self.timer_id = None
-        except Exception as e:
-            print(f"Error clearing window: {str(e)}")  # Using print to avoid disrupting UI
+        # Hide the disconnect wait message overlay
+        self.disconnect_overlay.place_forget()
 
 def main():
     try:
@@ -326,4 +453,4 @@ def main():
         messagebox.showerror("Application Error", f"An unexpected error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import metrics
+from rooms import FINISHED, RUNNING, WAITING
+
+# Append-only journal of game events, one compact JSON object per line:
+#   open      a room was created, with the questions it will ask
+#   session   a player's resume token
+#   join      a player took a seat
+#   start     the game began
+#   question  a question was sent
+#   answer    an answer arrived, with the points it earned
+#   close     the question closed
+#   leave     a player left for good
+#   end       the game finished, with the final standings
+# Every record carries the server wall-clock time "t".
+#
+# Appending only puts the record on a queue; a background thread serializes
+# whatever has accumulated every FLUSH_INTERVAL and commits it with a single
+# write and fsync, so the answer path never waits on the disk. A crash can lose
+# at most the last FLUSH_INTERVAL of events.
+#
+# A snapshot holds the state of every running room and the journal offset it
+# covers, so recovery replays only the records written after it.
+#
+#   python journal.py replay journal.log --room 3
+
+FLUSH_INTERVAL = 0.05   # Seconds between group commits
+MAX_BATCH = 1024        # Records that wake the writer before the interval is up
+
+def encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+class Snapshot:
+    # Queued behind the records it includes, so it is written only after they are on disk.
+    __slots__ = ('state',)
+
+    def __init__(self, state):
+        self.state = state
+
+class Journal:
+
+    def __init__(self, path, snapshot_path, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH, valid_end=None):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.file = open(path, 'ab')
+        if valid_end is not None and valid_end < self.file.tell():
+            # Drop a record torn by a crash so new records do not follow garbage
+            self.file.truncate(valid_end)
+            self.file.seek(valid_end)
+        self.pending = collections.deque()
+        self.lock = threading.Lock()    # Held while writing, by the thread or a final flush()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="journal", daemon=True)
+        self.thread.start()
+
+    def append(self, event, **fields):
+        # Called on the event loop; costs a dict and a deque append.
+        record = {'t': time.time(), 'e': event}
+        record.update(fields)
+        self.pending.append(record)
+        if len(self.pending) >= self.max_batch:
+            self.wakeup.set()
+
+    def snapshot(self, state):
+        # Queue a snapshot of state; it must not share mutable objects with the live rooms.
+        self.pending.append(Snapshot(state))
+        self.wakeup.set()
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        # Commit everything queued so far: one write and one fsync per batch.
+        with self.lock:
+            lines = []
+            while self.pending:
+                item = self.pending.popleft()
+                if item.__class__ is Snapshot:
+                    self.commit(lines)
+                    lines = []
+                    self.write_snapshot(item.state)
+                else:
+                    lines.append(encode(item))
+            self.commit(lines)
+
+    def commit(self, lines):
+        if not lines:
+            return
+        start = time.perf_counter()
+        self.file.write("".join(lines).encode())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        metrics.JOURNAL_RECORDS.inc(len(lines))
+        metrics.JOURNAL_COMMIT_SECONDS.observe(time.perf_counter() - start)
+
+    def write_snapshot(self, state):
+        # Write to a temporary file and rename it over the old snapshot, so one always survives.
+        state['offset'] = self.file.tell()
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, ensure_ascii=False, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+def read_records(path, offset=0):
+    # Yield (record, end offset) from offset on, stopping at a record torn by a crash.
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield record, offset
+
+def new_room(room_id, questions):
+    return {'room': room_id, 'questions': questions, 'state': WAITING, 'index': 0,
+            'scores': {}, 'answers': None, 'tokens': {}}
+
+def apply(rooms, record):
+    # Fold one record into {room id: room state}, the same shape GameRoom.journal_state() returns.
+    event = record['e']
+    room_id = record.get('room')
+    if event == 'open':
+        rooms[room_id] = new_room(room_id, record['questions'])
+        return
+    room = rooms.get(room_id)
+    if room is None:
+        return  # A room that ended before the snapshot these records follow
+    if event == 'session':
+        room['tokens'][record['nick']] = record['token']
+    elif event == 'join':
+        room['scores'][record['nick']] = 0
+    elif event == 'start':
+        room['state'] = RUNNING
+        room['index'] = 0
+    elif event == 'question':
+        room['index'] = record['index']
+        # A question asked again after a restart keeps the answers given before the crash
+        if not record.get('resumed') or room['answers'] is None:
+            room['answers'] = {}
+    elif event == 'answer':
+        if room['answers'] is not None:
+            room['answers'][record['nick']] = record['answer']
+        room['scores'][record['nick']] = room['scores'].get(record['nick'], 0) + record['points']
+    elif event == 'close':
+        room['answers'] = None
+        room['index'] += 1
+    elif event == 'leave':
+        room['scores'].pop(record['nick'], None)
+        room['tokens'].pop(record['nick'], None)
+        if room['answers'] is not None:
+            room['answers'].pop(record['nick'], None)
+    elif event == 'end':
+        room['state'] = FINISHED
+
+def recover(path, snapshot_path):
+    # Rebuild the unfinished games from the last snapshot plus the journal written after it.
+    # Returns (running room states, last room id, offset where the valid journal ends).
+    rooms, last_room_id, offset = {}, 0, 0
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as file:
+            snapshot = json.load(file)
+        rooms = {state['room']: state for state in snapshot['rooms']}
+        last_room_id = snapshot['last_room']
+        offset = snapshot['offset']
+    for record, offset in read_records(path, offset):
+        apply(rooms, record)
+        if record['e'] == 'open':
+            last_room_id = max(last_room_id, record['room'])
+    running = [state for state in rooms.values() if state['state'] == RUNNING]
+    return running, last_room_id, offset
+
+def replay(path, room_filter=None):
+    # Audit a journal offline: every answer with its timing, the points it should have
+    # earned according to the question's answer key, and the recomputed final scores.
+    rooms = {}
+    opened = {}     # Maps room ids to the time their current question was sent
+    problems = 0
+    for record, _ in read_records(path):
+        room_id = record.get('room')
+        event = record['e']
+        if room_filter is not None and room_id != room_filter:
+            continue
+        if event != 'open' and room_id not in rooms:
+            continue
+        clock = time.strftime('%H:%M:%S', time.localtime(record['t']))
+        if event == 'open':
+            print(f"\n[{clock}] Room {room_id} opened with {len(record['questions'])} questions")
+        elif event == 'start':
+            print(f"[{clock}] Room {room_id} started with {len(rooms[room_id]['scores'])} players")
+        elif event == 'question':
+            opened[room_id] = record['t']
+            question = rooms[room_id]['questions'][record['index']]
+            again = " again after a restart" if record.get('resumed') else ""
+            print(f"[{clock}]   Q{record['index'] + 1}{again}: {question['question']} (answer {question['answer']})")
+        elif event == 'answer':
+            room = rooms[room_id]
+            question = room['questions'][room['index']]
+            earned_expected = record['answer'] == question['answer']
+            flag = ""
+            if earned_expected != (record['points'] > 0):
+                flag = "   <-- points do not match the answer key"
+                problems += 1
+            delay = record.get('elapsed', record['t'] - opened.get(room_id, record['t']))
+            print(f"             {record['nick']:<20} {record['answer']:<3} {record['points']:>+4}  "
+                  f"after {delay:6.3f} s{flag}")
+        elif event == 'leave':
+            print(f"[{clock}]   {record['nick']} left")
+        elif event == 'end':
+            recomputed = sorted(rooms[room_id]['scores'].items(), key=lambda item: (-item[1], item[0]))
+            recorded = [tuple(row) for row in record['standings']]
+            print(f"[{clock}] Room {room_id} finished")
+            for nickname, score in recomputed:
+                print(f"             {nickname:<20} {score:>4} pts")
+            if recomputed != recorded:
+                print("             <-- recomputed scores differ from the recorded final standings")
+                problems += 1
+        apply(rooms, record)
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and audit Quizzie game journals.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_cmd = commands.add_parser('replay', help="print every game in a journal and check its scores")
+    replay_cmd.add_argument('journal', help="journal file, e.g. journal.log")
+    replay_cmd.add_argument('--room', type=int, help="only this room")
+    recover_cmd = commands.add_parser('recover', help="show which games a restarted server would resume")
+    recover_cmd.add_argument('journal')
+    recover_cmd.add_argument('snapshot')
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        problems = replay(args.journal, args.room)
+        print(f"\n{problems} problem(s) found")
+        raise SystemExit(1 if problems else 0)
+    running, last_room_id, offset = recover(args.journal, args.snapshot)
+    print(f"Journal valid up to byte {offset}; last room id {last_room_id}")
+    for state in running:
+        question = "between questions" if state['answers'] is None else f"{len(state['answers'])} answers in"
+        print(f"  Room {state['room']}: question {state['index'] + 1}, {question}, "
+              f"{len(state['scores'])} players {sorted(state['scores'].items())}")
+
+if __name__ == "__main__":
+    main()
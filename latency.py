@@ -0,0 +1,150 @@
+import time
+
+import metrics
+import protocol
+
+# Round-trip time and clock offset of every joined connection.
+#
+# Every PING_INTERVAL seconds the server sends each player a PING carrying a
+# sequence number. The client answers at once with a PONG echoing it plus its
+# own wall-clock time. From that the server keeps, per connection:
+#   rtt     smoothed round-trip time (the RFC 6298 estimator used by TCP)
+#   rttvar  smoothed deviation of the round-trip time
+#   offset  smoothed client clock minus server clock, assuming a symmetric path
+#
+# A client starts its countdown when the question reaches it and its answer
+# needs a while to come back, so a player far from the server loses about one
+# round trip of answer time. The room credits that back: each player's
+# deadline is extended by their RTT, and their answer time is measured from
+# when the question reached them. The credit is capped at MAX_COMPENSATION so
+# a client cannot buy extra time by delaying its pongs.
+#
+# The clock offset is diagnostic only: /links shows it to spot clients with a
+# wrong clock, but scoring never uses it. Answer times are taken from the
+# server's clock, because a timestamp sent by the client could be forged.
+
+PING_INTERVAL = 5           # Seconds between pings to each connection
+PING_TIMEOUT = 15           # Seconds after which an unanswered ping is given up and replaced
+RTT_ALPHA = 0.125           # Weight of a new sample in the smoothed RTT and offset
+RTT_BETA = 0.25             # Weight of a new sample in the RTT deviation
+MAX_COMPENSATION = 0.5      # Most answer time, in seconds, credited for a slow link
+REPORT_LIMIT = 100          # Connections listed by /links, slowest first
+
+class LinkStats:
+    __slots__ = ('rtt', 'rttvar', 'offset', 'samples', 'seq', 'sent_at', 'sent_wall')
+
+    def __init__(self):
+        self.rtt = None
+        self.rttvar = None
+        self.offset = None
+        self.samples = 0
+        self.seq = 0            # Sequence number of the outstanding ping
+        self.sent_at = None     # Server monotonic and wall-clock times it was sent at
+        self.sent_wall = None
+
+    def next_ping(self):
+        # Payload of the next ping; nothing is recorded until it was actually sent.
+        return str(self.seq + 1)
+
+    def ping_sent(self, now, wall):
+        # Start a new measurement; an unanswered earlier ping is forgotten.
+        self.seq += 1
+        self.sent_at = now
+        self.sent_wall = wall
+
+    def pong(self, payload, now):
+        # Fold in the reply to our last ping; returns the RTT sample, or None for a stale or bad reply.
+        seq, _, client_time = payload.partition(" ")
+        try:
+            if int(seq) != self.seq or self.sent_at is None:
+                return None
+            client_time = float(client_time)
+        except ValueError:
+            return None
+        sample = now - self.sent_at
+        offset = client_time - (self.sent_wall + sample / 2)
+        self.sent_at = None
+        if self.samples == 0:
+            self.rtt = sample
+            self.rttvar = sample / 2
+            self.offset = offset
+        else:
+            self.rttvar += RTT_BETA * (abs(self.rtt - sample) - self.rttvar)
+            self.rtt += RTT_ALPHA * (sample - self.rtt)
+            self.offset += RTT_ALPHA * (offset - self.offset)
+        self.samples += 1
+        return sample
+
+    def compensation(self):
+        # Answer time credited to this link: one round trip, within MAX_COMPENSATION.
+        if not self.samples:
+            return 0.0
+        return min(self.rtt, MAX_COMPENSATION)
+
+def compensation(client):
+    # Credit for any connection; connections that are not measured get none.
+    link = client.link
+    return link.compensation() if link is not None else 0.0
+
+class Pinger:
+    # Pings every joined connection from one periodic scheduler timer.
+
+    def __init__(self, scheduler, interval=PING_INTERVAL, wall_clock=time.time):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.wall_clock = wall_clock
+        self.clients = set()
+        self.timer = None
+
+    def start(self):
+        self.timer = self.scheduler.call_later(self.interval, self.tick)
+
+    def stop(self):
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+
+    def add(self, client):
+        # Measure a connection that just joined or resumed, starting right away.
+        client.link = LinkStats()
+        self.clients.add(client)
+        self.ping(client)
+
+    def discard(self, client):
+        self.clients.discard(client)
+
+    def ping(self, client):
+        link = client.link
+        # A ping stuck behind a backlog would only measure the backlog, so it is dropped;
+        # it then does not count as outstanding and the next tick tries again
+        if client.send(protocol.encode(protocol.PING, link.next_ping()), droppable=True):
+            link.ping_sent(self.scheduler.now(), self.wall_clock())
+
+    def tick(self):
+        # Ping every connection, except those still owing a reply to a recent ping.
+        now = self.scheduler.now()
+        for client in list(self.clients):
+            if client.closed:
+                self.clients.discard(client)
+            elif client.link.sent_at is None or now - client.link.sent_at > PING_TIMEOUT:
+                self.ping(client)
+        self.timer = self.scheduler.call_later(self.interval, self.tick)
+
+    def pong(self, client, payload):
+        if client.link is None:
+            return
+        sample = client.link.pong(payload, self.scheduler.now())
+        if sample is not None:
+            metrics.CLIENT_RTT_SECONDS.observe(sample)
+
+    def report(self, limit=REPORT_LIMIT):
+        # Plain-text table of the slowest measured connections and their send backlogs, for /links.
+        measured = [client for client in self.clients if client.link.samples]
+        measured.sort(key=lambda client: client.link.rtt, reverse=True)
+        lines = [f"# {len(self.clients)} connections, {len(measured)} measured; slowest {limit} shown",
+                 f"# {'peer':<28} {'rtt_ms':>9} {'rttvar_ms':>9} {'offset_ms':>10} {'samples':>7} {'backlog_b':>9}"]
+        for client in measured[:limit]:
+            link = client.link
+            peer = ":".join(str(part) for part in client.peer[:2]) if client.peer else "?"
+            lines.append(f"  {peer:<28} {link.rtt * 1000:>9.2f} {link.rttvar * 1000:>9.2f} "
+                         f"{link.offset * 1000:>10.2f} {link.samples:>7} {client.queue_depth():>9}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,107 @@
+import bisect
+import heapq
+
+TOP_K = 10  # Rows of the scoreboard every player receives
+
+class Leaderboard:
+    # Scores kept in rank order so a round never needs a full sort.
+    #
+    # Players are grouped into buckets by score, the distinct scores are kept in
+    # a sorted list, and a Fenwick tree counts players per score. A score change
+    # is O(log n), "my rank" is a prefix sum and top-K walks only the top buckets.
+    # Buckets are unordered sets, so picking names from a bucket with b players
+    # still costs O(b log k); only a whole table of tied players is expensive.
+
+    def __init__(self):
+        self.scores = {}        # Maps nicknames to their scores
+        self.buckets = {}       # Maps a score to the set of nicknames holding it
+        self.distinct = []      # Scores that currently have players, ascending
+        self.tree = [0] * 17    # Fenwick tree of player counts indexed by score + 1
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, nickname):
+        return nickname in self.scores
+
+    def add(self, nickname, score=0):
+        self.scores[nickname] = score
+        self._insert(nickname, score)
+
+    def remove(self, nickname):
+        score = self.scores.pop(nickname, None)
+        if score is not None:
+            self._discard(nickname, score)
+
+    def add_points(self, nickname, points):
+        # Move a player to a new score bucket.
+        old = self.scores[nickname]
+        new = old + points
+        self._discard(nickname, old)
+        self.scores[nickname] = new
+        self._insert(nickname, new)
+        return new
+
+    def rank(self, nickname):
+        # Competition rank: 1 + number of players with a strictly higher score.
+        return len(self.scores) - self._count_at_most(self.scores[nickname]) + 1
+
+    def top(self, k=TOP_K):
+        # The k best (nickname, score) pairs, ties broken by nickname.
+        result = []
+        for score in reversed(self.distinct):
+            if len(result) >= k:
+                break
+            # Only as many names as still fit: O(b log k) for a bucket of b, rather than a full sort
+            result.extend((nickname, score) for nickname in heapq.nsmallest(k - len(result), self.buckets[score]))
+        return result
+
+    def leaders(self):
+        # Everyone sharing the highest score; called once per game, so sorting the top bucket is fine.
+        if not self.distinct:
+            return []
+        return sorted(self.buckets[self.distinct[-1]])
+
+    def _insert(self, nickname, score):
+        if score + 1 >= len(self.tree):
+            self._grow(score + 1)
+        bucket = self.buckets.get(score)
+        if bucket is None:
+            bucket = self.buckets[score] = set()
+            bisect.insort(self.distinct, score)
+        bucket.add(nickname)
+        self._update(score, 1)
+
+    def _discard(self, nickname, score):
+        bucket = self.buckets[score]
+        bucket.discard(nickname)
+        if not bucket:
+            del self.buckets[score]
+            del self.distinct[bisect.bisect_left(self.distinct, score)]
+        self._update(score, -1)
+
+    def _update(self, score, delta):
+        i = score + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, score):
+        i = min(score + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, index):
+        # Double the tree until index fits, then rebuild it from the buckets.
+        size = len(self.tree)
+        while size <= index:
+            size *= 2
+        self.tree = [0] * size
+        for score, bucket in self.buckets.items():
+            i = score + 1
+            while i < size:
+                self.tree[i] += len(bucket)
+                i += i & -i
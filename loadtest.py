@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from bot_client import HOST, PORT, BotClient, load_answer_key
+from server import raise_fd_limit
+
+# Load generator: spawns many BotClients against a local server and reports
+# connect time, question delivery latency and answer-to-feedback latency.
+#
+#   python loadtest.py --players 2000 --spawn-server
+#   python loadtest.py --players 10000 --spawn-server --workers 4 --json bench.json
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list.
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(values):
+    # Percentiles in milliseconds.
+    values = sorted(values)
+    summary = {'count': len(values)}
+    for pct in (50, 95, 99):
+        value = percentile(values, pct)
+        summary[f'p{pct}'] = None if value is None else round(value * 1000, 3)
+    summary['max'] = round(values[-1] * 1000, 3) if values else None
+    return summary
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on {host}:{port}")
+
+def spawn_server(workers):
+    # Start server.py (or the supervisor) from the directory of this script.
+    here = os.path.dirname(os.path.abspath(__file__))
+    if workers > 1:
+        command = [sys.executable, 'supervisor.py', '--workers', str(workers)]
+    else:
+        command = [sys.executable, 'server.py']
+    return subprocess.Popen(command, cwd=here, stdout=subprocess.DEVNULL)
+
+async def run_bot(bot, results):
+    try:
+        await bot.run()
+    except (ConnectionError, OSError) as e:
+        results['errors'] += 1
+        results['error_kinds'][type(e).__name__] = results['error_kinds'].get(type(e).__name__, 0) + 1
+
+async def run_load(args):
+    rng = random.Random(args.seed)
+    answer_key = load_answer_key(args.questions)
+    results = {'errors': 0, 'error_kinds': {}}
+    bots = []
+    tasks = []
+
+    start = time.perf_counter()
+    interval = 1 / args.rate if args.rate > 0 else 0
+    for i in range(args.players):
+        bot = BotClient(f"bot{i}", args.host, args.port, answer_key, args.accuracy,
+                        (args.think_min, args.think_max), random.Random(rng.random()))
+        bots.append(bot)
+        tasks.append(asyncio.create_task(run_bot(bot, results)))
+        if interval:
+            await asyncio.sleep(interval)
+    # Players left in a room that never filled would wait forever
+    _, unfinished = await asyncio.wait(tasks, timeout=args.timeout)
+    for task in unfinished:
+        task.cancel()
+    elapsed = time.perf_counter() - start
+
+    frames = sum(bot.frames for bot in bots)
+    answers = sum(len(bot.feedback_latencies) for bot in bots)
+    return {
+        'players': args.players,
+        'finished': sum(1 for bot in bots if bot.final is not None),
+        'rejected': sum(1 for bot in bots if bot.rejected is not None),
+        'errors': results['errors'],
+        'error_kinds': results['error_kinds'],
+        'elapsed_s': round(elapsed, 3),
+        'frames_per_s': round(frames / elapsed, 1),
+        'answers_per_s': round(answers / elapsed, 1),
+        'connect_ms': summarize([bot.connect_time for bot in bots if bot.connect_time is not None]),
+        'question_delivery_ms': summarize([v for bot in bots for v in bot.question_latencies]),
+        'answer_feedback_ms': summarize([v for bot in bots for v in bot.feedback_latencies]),
+    }
+
+def print_report(report):
+    print(f"\nPlayers:    {report['players']} ({report['finished']} finished, {report['rejected']} rejected, "
+          f"{report['errors']} errors)")
+    print(f"Elapsed:    {report['elapsed_s']} s")
+    print(f"Throughput: {report['frames_per_s']} frames/s received, {report['answers_per_s']} answers/s scored")
+    print(f"{'':24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for label, key in (("Connect", 'connect_ms'),
+                       ("Question delivery", 'question_delivery_ms'),
+                       ("Answer -> FEEDBACK", 'answer_feedback_ms')):
+        row = report[key]
+        cells = ''.join(f"{'-' if row[k] is None else row[k]:>10}" for k in ('p50', 'p95', 'p99', 'max'))
+        print(f"{label:24}{row['count']:>8}{cells}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz server with simulated players.")
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--rate', type=float, default=500, help="new connections per second (0 for all at once)")
+    parser.add_argument('--think-min', type=float, default=0.2, help="shortest think time in seconds")
+    parser.add_argument('--think-max', type=float, default=2.0, help="longest think time in seconds")
+    parser.add_argument('--accuracy', type=float, default=0.7, help="chance a bot answers correctly")
+    parser.add_argument('--questions', default='questions.json', help="answer key for the bots")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--spawn-server', action='store_true', help="start a local server for the run")
+    parser.add_argument('--workers', type=int, default=1, help="with --spawn-server, use the supervisor")
+    parser.add_argument('--timeout', type=float, default=600, help="give up on players still waiting after this")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    process = None
+    if args.spawn_server:
+        process = spawn_server(args.workers)
+        wait_for_port(args.host, args.port, 15)
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import asyncio
+import bisect
+import collections
+import sys
+import threading
+import time
+
+# In-process metrics with a Prometheus text endpoint.
+#
+# Recording is a plain attribute update (plus a bisect for histograms) on the
+# event loop thread, so instrumenting the hot paths costs next to nothing.
+# Everything is formatted only when /metrics is scraped.
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9102             # Set to None to disable the endpoint
+LOOP_LAG_INTERVAL = 1.0         # Seconds between event loop lag probes
+PROFILE_INTERVAL = 0.005        # Seconds between profiler samples
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+ROUND_BUCKETS = (0.5, 1, 2, 5, 10, 15, 20, 30, 60)
+BATCH_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+RTT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1, 2.5)
+
+registry = []   # Every metric, in registration order
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        registry.append(self)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+class Gauge:
+    # A value that goes up and down; pass `read` to compute it at scrape time instead.
+    def __init__(self, name, help_text, read=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.read = read
+        registry.append(self)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.read() if self.read else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {value}"]
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        registry.append(self)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+# Connections and rooms
+CONNECTED_CLIENTS = Gauge("quizzie_connected_clients", "Client connections currently open.")
+ROOMS = Gauge("quizzie_rooms", "Game rooms waiting or running.")
+SPECTATORS = Gauge("quizzie_spectators", "Spectator connections watching a room.")
+SPECTATOR_UPDATES = Counter("quizzie_spectator_score_updates_total", "Coalesced scoreboard updates sent to room audiences.")
+JOIN_SECONDS = Histogram("quizzie_join_handshake_seconds", "Time from accept to joining a room.")
+REJECTED_CONNECTIONS = Counter("quizzie_rejected_connections_total", "Connections refused by admission control.")
+HANDSHAKE_TIMEOUTS = Counter("quizzie_handshake_timeouts_total", "Connections closed for not sending NICK or RESUME in time.")
+EVICTIONS = Counter("quizzie_slow_client_evictions_total", "Clients evicted for an oversized send backlog.")
+RESUMES = Counter("quizzie_session_resumes_total", "Reconnects that took back a held seat with a resume token.")
+EXPIRED_SESSIONS = Counter("quizzie_session_expired_total", "Held seats given up because the player did not return in time.")
+
+# Fan-out
+BROADCAST_SECONDS = Histogram("quizzie_broadcast_seconds", "Time to queue one broadcast for every player in a room.")
+BYTES_SENT = Counter("quizzie_bytes_sent_total", "Bytes queued for clients.")
+DROPPED_MESSAGES = Counter("quizzie_dropped_messages_total", "Droppable messages skipped for lagging clients.")
+SEND_BACKLOG = Gauge("quizzie_send_backlog_bytes", "Bytes queued for players that the kernel has not taken yet.")
+MAX_SEND_BACKLOG = Gauge("quizzie_send_backlog_max_bytes", "Largest send backlog of any one player.")
+
+# Rounds and answers
+ROUND_SECONDS = Histogram("quizzie_round_seconds", "Time a question stayed open.", ROUND_BUCKETS)
+ANSWERS = Counter("quizzie_answers_total", "Answers accepted while a question was open.")
+LATE_ANSWERS = Counter("quizzie_late_answers_total", "Answers that arrived after the player's deadline or while no question was open.")
+DUPLICATE_ANSWERS = Counter("quizzie_duplicate_answers_total", "Second and later answers to the same question.")
+SCORED_BATCH_SIZE = Histogram("quizzie_scored_batch_size", "Answers scored together in one batch.", BATCH_BUCKETS)
+SCORING_SECONDS = Histogram("quizzie_scoring_seconds", "Time to score one batch of answers and queue its feedback.")
+ANSWER_COMPENSATION_SECONDS = Histogram("quizzie_answer_compensation_seconds",
+                                        "Answer time credited back to players for their round-trip time.", RTT_BUCKETS)
+
+# Client links
+CLIENT_RTT_SECONDS = Histogram("quizzie_client_rtt_seconds", "Round-trip time samples from PING/PONG.", RTT_BUCKETS)
+
+# Journal (written from its own thread)
+JOURNAL_RECORDS = Counter("quizzie_journal_records_total", "Game events committed to the journal.")
+JOURNAL_COMMIT_SECONDS = Histogram("quizzie_journal_commit_seconds", "Time to write and fsync one batch of journal records.")
+
+# The game state has no lock since it lives on one event loop; the closest
+# equivalent of lock contention is how late the loop runs ready callbacks.
+LOOP_LAG = Histogram("quizzie_event_loop_lag_seconds", "Delay between a callback being due and running.")
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class SamplingProfiler:
+    # Samples the event loop thread's stack from a background thread while enabled.
+    # Results are collapsed stacks ("outer;inner;leaf count"), ready for flame graphs.
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.samples.clear()
+        self.running = True
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def sample_loop(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def report(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+profiler = None     # SamplingProfiler for the loop thread, created with the endpoint
+lag_probe = None    # Task running probe_loop_lag
+link_report = None  # Returns the per-client RTT table for /links; set by the server
+
+async def handle_request(reader, writer):
+    # Minimal HTTP/1.0: GET /metrics, /links, /profile, /profile/start, /profile/stop.
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()).strip():
+            pass    # Skip headers
+        parts = request_line.decode(errors='ignore').split()
+        path = parts[1] if len(parts) > 1 else '/'
+        status = "200 OK"
+        if path == '/metrics':
+            body = render()
+        elif path == '/links' and link_report is not None:
+            body = link_report()
+        elif path == '/profile/start':
+            profiler.start()
+            body = "profiler started\n"
+        elif path == '/profile/stop':
+            profiler.stop()
+            body = "profiler stopped\n"
+        elif path == '/profile':
+            body = profiler.report()
+        else:
+            status, body = "404 Not Found", "not found\n"
+        data = body.encode()
+        writer.write(f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+async def probe_loop_lag():
+    # Sleep for a fixed interval and record how much later than that we woke up.
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
+async def start_endpoint(port=METRICS_PORT):
+    # Serve metrics on the running loop; returns the server, or None if disabled.
+    global profiler, lag_probe
+    if port is None:
+        return None
+    profiler = SamplingProfiler(threading.get_ident())
+    server = await asyncio.start_server(handle_request, METRICS_HOST, port)
+    lag_probe = asyncio.create_task(probe_loop_lag())
+    print(f"[METRICS] http://{METRICS_HOST}:{port}/metrics")
+    return server
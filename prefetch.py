@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import secrets
+
+# Question prefetch with a deferred reveal.
+#
+# During the pause before a question, the room sends every player the question
+# sealed with a fresh random key (PREFETCH). When the round opens it only sends
+# a REVEAL frame of a few dozen bytes: the question number, the key and the
+# seconds to answer. Clients decrypt the cached copy and show it at once, so
+# the round start costs the same tiny fan-out in a room of any size, and no
+# client can read a question before it opens.
+#
+# The cipher is a SHAKE-256 keystream XORed over the UTF-8 text. Every key is
+# used for exactly one question, and the point is only to keep the text unread
+# until the reveal, so no authentication is added.
+#
+#   PREFETCH payload: "<index> <base64 sealed text>"
+#   REVEAL payload:   "<index> <hex key> <seconds to answer>"
+
+KEY_BYTES = 16  # Random bytes per question key
+
+def new_key():
+    return secrets.token_bytes(KEY_BYTES)
+
+def crypt(data, key):
+    # XOR data with the key's keystream; the same call seals and opens.
+    size = len(data)
+    stream = hashlib.shake_256(key).digest(size)
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(size, 'big')
+
+def seal(index, text, key):
+    # PREFETCH payload for question number index.
+    return f"{index} {base64.b64encode(crypt(text.encode(), key)).decode()}"
+
+def reveal(index, key, seconds):
+    # REVEAL payload that opens the prefetched question index.
+    return f"{index} {key.hex()} {seconds}"
+
+class PrefetchCache:
+    # Client side: sealed questions received ahead of time, keyed by question number.
+
+    def __init__(self):
+        self.sealed = {}
+
+    def store(self, payload):
+        index, _, blob = payload.partition(" ")
+        self.sealed[int(index)] = base64.b64decode(blob)
+
+    def open(self, payload):
+        # Decrypt the question a REVEAL frame opens; returns (text, seconds), or None if it was never prefetched.
+        index, key, seconds = payload.split(" ")
+        data = self.sealed.pop(int(index), None)
+        if data is None:
+            return None
+        return crypt(data, bytes.fromhex(key)).decode(), float(seconds)
+
+    def clear(self):
+        self.sealed.clear()
@@ -0,0 +1,102 @@
+import struct
+
+# Every frame is a 6 byte header followed by a UTF-8 payload:
+#   version (1 byte) | message type (1 byte) | payload length (4 bytes, big endian)
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("!BBI")
+MAX_PAYLOAD = 1024 * 1024   # Anything larger is treated as a corrupt stream
+
+# Client -> server message types
+NICK = 1
+ANSWER = 2
+RESUME = 3                  # Resume token from SESSION, sent instead of NICK after a reconnect
+PONG = 4                    # Reply to PING: its sequence number and the client's wall-clock time
+SPECTATE = 5                # Sent instead of NICK to watch a room: its id, or empty for the newest room
+
+# Server -> client message types
+STATUS = 10
+QUESTION = 11
+FEEDBACK = 12
+SCORE = 13
+FINAL = 14
+WAIT_DISCONNECT = 15
+RESUME_AFTER_DISCONNECT = 16
+RANK = 17                   # A player's own rank, sent alongside the top-K scoreboard
+TIMESTAMP = 18              # Server wall-clock send time of the frame that follows it
+SESSION = 19                # Resume token issued at join; empty when a RESUME was refused
+SNAPSHOT = 20               # JSON state of the game in progress, the reply to a successful RESUME
+REJECT = 21                 # Connection refused by admission control; the payload says why
+PREFETCH = 22               # Next question, sealed with a key that is sent when it opens (see prefetch.py)
+REVEAL = 23                 # Opens a prefetched question: its number, key and seconds to answer
+PING = 24                   # Round-trip probe with a sequence number, answered at once with PONG
+
+MESSAGE_NAMES = {
+    NICK: "NICK",
+    ANSWER: "ANSWER",
+    RESUME: "RESUME",
+    PONG: "PONG",
+    SPECTATE: "SPECTATE",
+    STATUS: "STATUS",
+    QUESTION: "QUESTION",
+    FEEDBACK: "FEEDBACK",
+    SCORE: "SCORE",
+    FINAL: "FINAL",
+    WAIT_DISCONNECT: "WAIT_DISCONNECT",
+    RESUME_AFTER_DISCONNECT: "RESUME_AFTER_DISCONNECT",
+    RANK: "RANK",
+    TIMESTAMP: "TIMESTAMP",
+    SESSION: "SESSION",
+    SNAPSHOT: "SNAPSHOT",
+    REJECT: "REJECT",
+    PREFETCH: "PREFETCH",
+    REVEAL: "REVEAL",
+    PING: "PING",
+}
+
+class ProtocolError(Exception):
+    # Raised when the peer sends bytes that are not a valid frame stream.
+    pass
+
+def encode(msg_type, payload=""):
+    # Build one frame. Encode once and reuse the bytes when sending to many clients.
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, len(payload)) + payload
+
+def encode_many(messages):
+    # Pack several (type, payload) messages into one buffer for a single write.
+    return b"".join(encode(msg_type, payload) for msg_type, payload in messages)
+
+class FrameDecoder:
+    # Incremental decoder: feed it whatever recv() returned, get back complete frames.
+    # Partial frames stay buffered until the rest arrives, so split or coalesced
+    # reads (and multibyte characters cut in half) are handled transparently.
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.buffer = bytearray()
+        self.max_payload = max_payload  # Larger frames are refused as soon as their header arrives
+
+    def feed(self, data):
+        # Append received bytes and return a list of (message type, payload text).
+        self.buffer += data
+        frames = []
+        offset = 0
+        size = len(self.buffer)
+        while size - offset >= HEADER.size:
+            version, msg_type, length = HEADER.unpack_from(self.buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version {version}")
+            if length > self.max_payload:
+                raise ProtocolError(f"Frame of {length} bytes exceeds the {self.max_payload} byte limit")
+            end = offset + HEADER.size + length
+            if end > size:
+                break
+            try:
+                payload = self.buffer[offset + HEADER.size:end].decode()
+            except UnicodeDecodeError:
+                raise ProtocolError("Frame payload is not valid UTF-8")
+            frames.append((msg_type, payload))
+            offset = end
+        if offset:
+            del self.buffer[:offset]
+        return frames
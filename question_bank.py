@@ -0,0 +1,154 @@
+import argparse
+import bisect
+import json
+import mmap
+import os
+import random
+import struct
+from array import array
+
+# Compiled question bank layout (all integers big endian):
+#   header   magic | record count | index offset | groups offset | groups length
+#   records  one compact JSON object per question, back to back
+#   index    record count + 1 offsets; record i spans index[i]..index[i + 1]
+#   members  for every (category, difficulty) group, the record numbers in it
+#   groups   JSON object mapping "category|difficulty" to [members offset, count]
+# Only the header and the small groups table are read when the bank is opened;
+# questions are read from the memory map when a game asks for them.
+MAGIC = b"QZB1"
+HEADER = struct.Struct("!4sIQQI")
+OFFSET = struct.Struct("!Q")
+MEMBER = struct.Struct("!I")
+
+DEFAULT_CATEGORY = "general"
+DEFAULT_DIFFICULTY = "medium"
+
+def group_key(category, difficulty):
+    return f"{category}|{difficulty}"
+
+def read_source(path):
+    # Yield questions from a JSON array file or a JSON Lines file.
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(file)
+
+def build(source_path, bank_path):
+    # Compile questions.json (or .jsonl) into the indexed bank format.
+    offsets = array('Q')
+    members = {}    # Maps group keys to arrays of record numbers
+    tmp_path = bank_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(b"\0" * HEADER.size)
+        for number, question in enumerate(read_source(source_path)):
+            offsets.append(out.tell())
+            out.write(json.dumps(question, ensure_ascii=False, separators=(',', ':')).encode())
+            key = group_key(question.get('category', DEFAULT_CATEGORY),
+                            question.get('difficulty', DEFAULT_DIFFICULTY))
+            members.setdefault(key, array('I')).append(number)
+        count = len(offsets)
+        offsets.append(out.tell())
+
+        index_offset = out.tell()
+        for offset in offsets:
+            out.write(OFFSET.pack(offset))
+
+        groups = {}
+        for key, numbers in members.items():
+            groups[key] = [out.tell(), len(numbers)]
+            for number in numbers:
+                out.write(MEMBER.pack(number))
+
+        groups_offset = out.tell()
+        groups_blob = json.dumps(groups, ensure_ascii=False).encode()
+        out.write(groups_blob)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, count, index_offset, groups_offset, len(groups_blob)))
+    os.replace(tmp_path, bank_path)
+    return count
+
+def ensure_built(source_path, bank_path):
+    # Rebuild the bank if it is missing or older than its source file.
+    if not os.path.exists(bank_path) or os.path.getmtime(bank_path) < os.path.getmtime(source_path):
+        count = build(source_path, bank_path)
+        print(f"[BANK] Compiled {count} questions from {source_path} into {bank_path}")
+
+class QuestionBank:
+    # Read-only, memory-mapped view of a compiled question bank.
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.index_offset, groups_offset, groups_length = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled question bank")
+        self.groups = json.loads(self.data[groups_offset:groups_offset + groups_length])
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def categories(self):
+        return sorted({key.split('|', 1)[0] for key in self.groups})
+
+    def difficulties(self):
+        return sorted({key.split('|', 1)[1] for key in self.groups})
+
+    def get(self, number):
+        # Decode a single question by record number.
+        start, end = struct.unpack_from("!QQ", self.data, self.index_offset + number * OFFSET.size)
+        return json.loads(self.data[start:end])
+
+    def sample(self, k, category=None, difficulty=None, rng=random):
+        # Draw up to k distinct questions matching the filters, in random order.
+        # Cost depends on k and the number of groups, not on the size of the bank.
+        chosen = []
+        starts = []
+        total = 0
+        for key, (members_offset, count) in self.groups.items():
+            group_category, group_difficulty = key.split('|', 1)
+            if category is not None and group_category != category:
+                continue
+            if difficulty is not None and group_difficulty != difficulty:
+                continue
+            chosen.append(members_offset)
+            starts.append(total)
+            total += count
+
+        questions = []
+        for position in rng.sample(range(total), min(k, total)):
+            group = bisect.bisect_right(starts, position) - 1
+            member_at = chosen[group] + (position - starts[group]) * MEMBER.size
+            questions.append(self.get(MEMBER.unpack_from(self.data, member_at)[0]))
+        return questions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and inspect Quizzie question banks.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help="compile a JSON or JSON Lines question file")
+    build_cmd.add_argument('source', help="questions.json or a .jsonl file")
+    build_cmd.add_argument('bank', help="output path, e.g. questions.qbank")
+    info_cmd = commands.add_parser('info', help="show what a compiled bank contains")
+    info_cmd.add_argument('bank')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build(args.source, args.bank)
+        print(f"Compiled {count} questions into {args.bank}")
+    else:
+        bank = QuestionBank(args.bank)
+        print(f"{len(bank)} questions")
+        for key, (_, count) in sorted(bank.groups.items()):
+            category, difficulty = key.split('|', 1)
+            print(f"  {category} / {difficulty}: {count}")
+        bank.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+
+import admission
+import protocol
+from fanout import ClientConnection
+from scheduler import Scheduler
+from spectators import Audience
+
+# Relay tier for large read-only audiences.
+#
+# A relay connects to the game server as one spectator per watched room and
+# re-serves that stream to any number of its own viewers, who talk to the relay
+# exactly as they would to the server (SPECTATE with a room label). The server
+# pays for a single connection per room per relay however many people watch,
+# so an audience scales by adding relays, which may also feed other relays.
+# Viewers who arrive late get the latest status, question and scores at once;
+# the scoreboard is already rate-capped by the server.
+#
+#   python relay.py serve --upstream 127.0.0.1:5002 --port 5003
+#   python relay.py watch 3 --server 127.0.0.1:5003
+
+UPSTREAM = '127.0.0.1:5002'     # Game server, or another relay
+RELAY_HOST = '127.0.0.1'
+RELAY_PORT = 5003
+LISTEN_BACKLOG = 4096
+READ_SIZE = 4096
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or RELAY_HOST, int(port)
+
+class Feed:
+    # One upstream spectator connection, shared by every viewer of the same room on this relay.
+
+    def __init__(self, relay, label):
+        self.relay = relay
+        self.label = label
+        self.audience = Audience(relay.scheduler)
+        self.writer = None
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        try:
+            reader, self.writer = await asyncio.open_connection(*self.relay.upstream)
+            self.writer.write(protocol.encode(protocol.SPECTATE, self.label))
+            decoder = protocol.FrameDecoder()
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                for msg_type, payload in decoder.feed(data):
+                    self.audience.publish(msg_type, payload)
+        except (ConnectionError, OSError, protocol.ProtocolError) as e:
+            print(f"[RELAY] Upstream for room '{self.label}' failed: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        # The stream ended or nobody watches it any more: hang up on both sides.
+        if self.relay.feeds.get(self.label) is self:
+            del self.relay.feeds[self.label]
+        if self.writer is not None:
+            self.writer.close()
+        self.audience.close()
+
+class Relay:
+
+    def __init__(self, upstream):
+        self.upstream = upstream        # (host, port) to subscribe at
+        self.scheduler = Scheduler()
+        self.gate = admission.Admission()
+        self.feeds = {}                 # Maps room labels to feeds
+
+    async def handle_viewer(self, reader, writer):
+        # Serve one viewer: read its SPECTATE, then only send until it hangs up.
+        peer = writer.get_extra_info("peername")
+        reason = self.gate.check(peer[0] if peer else "")
+        if reason is not None:
+            writer.write(protocol.encode(protocol.REJECT, reason))
+            writer.close()
+            return
+        client = ClientConnection(writer)
+        feed = None
+        decoder = protocol.FrameDecoder(admission.HANDSHAKE_MAX_PAYLOAD)
+        self.gate.opened()
+        deadline = self.scheduler.call_later(admission.HANDSHAKE_TIMEOUT, client.close)
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                for msg_type, payload in decoder.feed(data):
+                    if feed is not None:
+                        continue
+                    if msg_type != protocol.SPECTATE:
+                        raise protocol.ProtocolError("Expected SPECTATE first")
+                    feed = self.feeds.get(payload)
+                    if feed is None:
+                        feed = self.feeds[payload] = Feed(self, payload)
+                    feed.audience.add(client)
+                    self.scheduler.cancel(deadline)
+                    self.gate.joined()
+        except (ConnectionError, OSError, protocol.ProtocolError):
+            pass
+        finally:
+            if feed is not None:
+                feed.audience.remove(client)
+                if not feed.audience.viewers:
+                    feed.task.cancel()
+            else:
+                self.scheduler.cancel(deadline)
+            self.gate.closed(joined=feed is not None)
+            client.close()
+
+async def serve(upstream, host, port):
+    relay = Relay(upstream)
+    relay.scheduler.attach(asyncio.get_running_loop())
+    server = await asyncio.start_server(relay.handle_viewer, host, port, backlog=LISTEN_BACKLOG)
+    print(f"[RELAY] Serving viewers on {host}:{port} from {upstream[0]}:{upstream[1]}")
+    async with server:
+        await server.serve_forever()
+
+async def watch(address, label):
+    # Minimal terminal spectator: print everything the room sends until the final scores.
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(protocol.encode(protocol.SPECTATE, label))
+    decoder = protocol.FrameDecoder()
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                return
+            for msg_type, payload in decoder.feed(data):
+                print(f"[{protocol.MESSAGE_NAMES.get(msg_type, msg_type)}] {payload.strip()}")
+                if msg_type in (protocol.FINAL, protocol.REJECT):
+                    return
+    finally:
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay Quizzie rooms to large read-only audiences.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = commands.add_parser('serve', help="re-serve watched rooms to viewers")
+    serve_cmd.add_argument('--upstream', default=UPSTREAM, help="game server or relay, host:port")
+    serve_cmd.add_argument('--host', default=RELAY_HOST)
+    serve_cmd.add_argument('--port', type=int, default=RELAY_PORT)
+    watch_cmd = commands.add_parser('watch', help="print a room's questions and scores")
+    watch_cmd.add_argument('room', nargs='?', default="", help="room label, e.g. 3 or 1.3; newest room if omitted")
+    watch_cmd.add_argument('--server', default=UPSTREAM, help="game server or relay, host:port")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(parse_address(args.upstream), args.host, args.port))
+        else:
+            asyncio.run(watch(parse_address(args.server), args.room))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"[RELAY] {e}")
+
+if __name__ == "__main__":
+    main()
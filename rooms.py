@@ -0,0 +1,589 @@
+import json
+import random
+import time
+
+import fanout
+import latency
+import metrics
+import prefetch
+import protocol
+import scoring
+from leaderboard import Leaderboard, TOP_K
+from sessions import SessionTable
+from spectators import Audience
+
+# Constants
+QUESTION_TIME_LIMIT = 20  # Time limit for each question in seconds
+MIN_PLAYERS = 3           # Minimum players required to start a room
+MAX_PLAYERS = 8           # A room starts immediately once it is this full
+LOBBY_FILL_TIME = 5       # Seconds a room keeps filling after reaching MIN_PLAYERS
+START_DELAY = 1           # Pause before the first question
+QUESTION_GAP = 2          # Pause between questions
+QUESTIONS_PER_GAME = 10   # Questions drawn from the bank for each room
+SCORE_BATCH_DELAY = 0     # Seconds answers may wait to be scored together (0: once per loop pass)
+BATCH_SCORING_SEATS = 64  # Rooms with fewer seats score each answer as it arrives
+LOG_EVENTS = True         # Print joins, leaves and room starts
+
+# Pre-encoded frames sent to many clients
+FEEDBACK_CORRECT = protocol.encode(protocol.FEEDBACK, "CORRECT")
+FEEDBACK_WRONG = protocol.encode(protocol.FEEDBACK, "WRONG")
+
+# Room lifecycle states
+WAITING = "waiting"
+RUNNING = "running"
+FINISHED = "finished"
+
+def log(message):
+    if LOG_EVENTS:
+        print(message)
+
+fanout.log = log
+
+def format_rank(standing, total):
+    rank, score = standing
+    return f"You: #{rank} of {total} with {score} pts"
+
+def format_question(index, q):
+    return (f"\n❓ Question {index+1}: {q['question']}\nA) {q['A']}  B) {q['B']}  C) {q['C']}  D) {q['D']}"
+            f"\n⏱️ You have {QUESTION_TIME_LIMIT} seconds!")
+
+class GameRoom:
+    # One quiz game: its own roster, scores, question set and lifecycle.
+
+    def __init__(self, room_id, questions, scheduler, min_players=MIN_PLAYERS, max_players=MAX_PLAYERS,
+                 on_finish=None, journal=None, points_mode=scoring.FIXED):
+        self.room_id = room_id
+        self.questions = questions
+        self.scheduler = scheduler      # Drives question open/close and the gaps between them
+        self.on_finish = on_finish      # Called with the room once the final scores are out
+        self.journal = journal          # Event log for crash recovery and audits, if enabled
+        self.points_mode = points_mode  # scoring.FIXED or scoring.TIME_DECAY
+        self.min_players = min_players
+        self.max_players = max_players
+        self.clients = {}       # Maps client connections to nicknames
+        self.away = set()       # Nicknames whose connection dropped but whose seat is held
+        self.leaderboard = Leaderboard()
+        self.sent_ranks = {}    # Maps client connections to the last (rank, score) sent to them
+        self.audience = Audience(scheduler, self.live_scoreboard)  # Spectators, outside the broadcast loop
+        self.state = WAITING
+
+        # Every player gets a seat number that indexes the per-seat tables below
+        self.seats = {}         # Maps nicknames to seat numbers
+        self.seat_names = []    # Nickname in each seat, None once its player left
+        self.seat_clients = []  # Connection in each seat, None while its player is away
+
+        # Round state; answered (choice code per seat, 0 for none) is only set while a question is open
+        self.question_index = 0
+        self.answered = None
+        self.answer_count = 0
+        self.pending = scoring.AnswerColumns()  # Answers received but not scored yet
+        self.batch_timer = None
+        self.correct_code = None
+        self.question_text = None
+        self.opened_at = None
+        self.final_text = None
+        self.prefetched = None  # (index, text, key, PREFETCH payload) of the next question, sent but sealed
+        self.timer = None       # Next scheduled step of this room
+
+    def is_full(self):
+        return len(self.clients) >= self.max_players
+
+    def record(self, event, **fields):
+        if self.journal is not None:
+            self.journal.append(event, room=self.room_id, **fields)
+
+    def add_player(self, client, nickname):
+        # Register a player; duplicate nicknames get a suffix so scores stay separate.
+        base, n = nickname, 2
+        while nickname in self.leaderboard:
+            nickname = f"{base} ({n})"
+            n += 1
+        self.clients[client] = nickname
+        self.leaderboard.add(nickname)
+        self.seats[nickname] = len(self.seat_names)
+        self.seat_names.append(nickname)
+        self.seat_clients.append(client)
+        self.record('join', nick=nickname)
+        log(f"[+] {nickname} joined room {self.room_id}. Total players: {len(self.clients)}")
+        return nickname
+
+    def remove_player(self, client):
+        # Remove a disconnected player and clean up related data.
+        nickname = self.clients.pop(client, None)
+        if nickname is None:
+            return
+        log(f"[-] {nickname} left room {self.room_id}.")
+        self.free_seat(nickname)
+        self.sent_ranks.pop(client, None)
+        self.close_if_answered()
+
+    def free_seat(self, nickname):
+        # Forget a player for good; an answer of theirs still waiting to be scored is skipped.
+        self.leaderboard.remove(nickname)
+        self.record('leave', nick=nickname)
+        seat = self.seats.pop(nickname)
+        self.seat_names[seat] = None
+        self.seat_clients[seat] = None
+        if self.answered is not None and self.answered[seat]:
+            self.answer_count -= 1
+
+    def suspend_player(self, client):
+        # Stop sending to a dropped player but keep their name and score for a resume.
+        nickname = self.clients.pop(client, None)
+        if nickname is None:
+            return
+        log(f"[~] {nickname} dropped from room {self.room_id}; holding their seat.")
+        self.away.add(nickname)
+        self.seat_clients[self.seats[nickname]] = None
+        self.sent_ranks.pop(client, None)
+        self.close_if_answered()
+
+    def resume_player(self, client, nickname):
+        # Give a held seat to the player's new connection and bring them up to date.
+        # Returns False if the seat is gone, e.g. the player was removed for good.
+        if nickname not in self.seats:
+            return False
+        self.away.discard(nickname)
+        self.clients[client] = nickname
+        self.seat_clients[self.seats[nickname]] = client
+        log(f"[+] {nickname} resumed in room {self.room_id}.")
+        client.send(protocol.encode(protocol.SNAPSHOT, self.snapshot(nickname)))
+        if self.prefetched is not None:
+            # The prefetch went out while they were away; the reveal would find nothing to open
+            client.send(protocol.encode(protocol.PREFETCH, self.prefetched[3]))
+        return True
+
+    def drop_player(self, nickname):
+        # A held seat expired: forget the player for good.
+        if nickname not in self.away:
+            return
+        self.away.discard(nickname)
+        self.free_seat(nickname)
+        log(f"[-] {nickname} did not come back to room {self.room_id}.")
+
+    def snapshot(self, nickname):
+        # Compact JSON of what a resuming player needs: the open question, time left and their standing.
+        state = {'state': self.state, 'score': self.leaderboard.scores.get(nickname, 0),
+                 'rank': self.rank_text(nickname)}
+        if self.answered is not None:
+            state['question'] = self.question_text
+            state['remaining'] = round(max(0.0, self.opened_at + QUESTION_TIME_LIMIT - self.scheduler.now()), 2)
+            state['answered'] = bool(self.answered[self.seats[nickname]])
+        if self.final_text is not None:
+            state['final'] = self.final_text
+        return json.dumps(state, separators=(',', ':'))
+
+    def all_answered(self):
+        # Every connected player has answered; players who are away are not waited for.
+        # With nobody connected the round runs its full time, giving them a chance to return.
+        if not self.clients:
+            return not self.away
+        if self.answer_count < len(self.clients):
+            return False
+        answered, seats = self.answered, self.seats
+        return all(answered[seats[nickname]] for nickname in self.clients.values())
+
+    def close_if_answered(self):
+        # A departed player should not hold the round open; close it outside any broadcast loop
+        if self.answered is not None and self.all_answered():
+            self.scheduler.cancel(self.timer)
+            self.timer = self.scheduler.call_later(0, self.close_question)
+
+    def broadcast(self, msg_type, payload, droppable=False, stamped=False):
+        # Queue a message for every player in this room, encoding the frame only once.
+        # Stamped messages are preceded by the server's send time, for latency measurement.
+        start = time.perf_counter()
+        data = protocol.encode(msg_type, payload)
+        if stamped:
+            data = protocol.encode(protocol.TIMESTAMP, f"{time.time():.6f}") + data
+        for client in fanout.fan_out(list(self.clients), data, droppable):
+            self.drop_connection(client)
+        metrics.BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+    def drop_connection(self, client):
+        # A send failed and the connection is closed. Treat it like any dropped connection: in a
+        # running game the seat is held, and the Lobby's leave() then starts the resume grace period.
+        if self.state == RUNNING:
+            self.suspend_player(client)
+        else:
+            self.remove_player(client)
+
+    def broadcast_status(self, starting_in=None):
+        # Tell the room how many players are here and whether the game is about to start.
+        count = len(self.clients)
+        needed = max(0, self.min_players - count)
+        if needed > 0:
+            status = f"⏳ {count}/{self.min_players} players connected. Waiting for {needed} more..."
+        elif starting_in:
+            status = f"✅ {count}/{self.max_players} players connected. Starting in {starting_in} seconds..."
+        else:
+            status = f"✅ {count}/{self.max_players} players connected. Starting quiz..."
+        self.broadcast(protocol.STATUS, status, droppable=True)
+        self.audience.publish(protocol.STATUS, status)
+
+    def record_answer(self, client, answer):
+        # Store an answer that arrived before the player's deadline; it is scored with its batch.
+        # Time is measured from when the question reached the player, so their link's RTT is credited back.
+        if self.answered is None:
+            metrics.LATE_ANSWERS.inc()
+            return
+        nickname = self.clients.get(client)
+        if nickname is None:
+            return
+        seat = self.seats[nickname]
+        if self.answered[seat]:
+            metrics.DUPLICATE_ANSWERS.inc()
+            return
+        rtt_credit = latency.compensation(client)
+        elapsed = max(0.0, self.scheduler.now() - self.opened_at - rtt_credit)
+        if elapsed > QUESTION_TIME_LIMIT:
+            metrics.LATE_ANSWERS.inc()
+            return
+        metrics.ANSWERS.inc()
+        if rtt_credit:
+            metrics.ANSWER_COMPENSATION_SECONDS.observe(rtt_credit)
+        code = scoring.choice_code(answer)
+        self.answered[seat] = code
+        self.answer_count += 1
+        if len(self.seat_names) < BATCH_SCORING_SEATS:
+            # Small rooms gain nothing from batching; score right away
+            self.credit(seat, code, elapsed,
+                        scoring.score_one(code, elapsed, self.correct_code, QUESTION_TIME_LIMIT, self.points_mode))
+        else:
+            self.pending.append(seat, code, elapsed)
+        if self.all_answered():
+            self.close_question()
+        elif len(self.pending) and self.batch_timer is None:
+            self.batch_timer = self.scheduler.call_later(SCORE_BATCH_DELAY, self.score_batch)
+
+    def score_batch(self):
+        # Score every answer received since the last batch in one pass and send each its feedback.
+        self.scheduler.cancel(self.batch_timer)
+        self.batch_timer = None
+        pending = self.pending
+        if not len(pending):
+            return
+        start = time.perf_counter()
+        points = scoring.score(pending, self.correct_code, QUESTION_TIME_LIMIT, self.points_mode)
+        credit = self.credit
+        for seat, choice, elapsed, earned in zip(pending.seats, pending.choices, pending.elapsed, points):
+            credit(seat, choice, elapsed, earned)
+        metrics.SCORED_BATCH_SIZE.observe(len(pending))
+        metrics.SCORING_SECONDS.observe(time.perf_counter() - start)
+        pending.clear()
+
+    def credit(self, seat, choice, elapsed, earned):
+        # Apply one scored answer: points, journal record and feedback to the player who answered.
+        nickname = self.seat_names[seat]
+        if nickname is None:
+            return  # Left before the answer was scored
+        if earned:
+            self.leaderboard.add_points(nickname, earned)
+            if self.audience.viewers:
+                self.audience.scores_changed()
+        if self.journal is not None:
+            self.record('answer', nick=nickname, answer=scoring.CHOICE_LETTERS[choice], points=earned,
+                        elapsed=round(elapsed, 4))
+        client = self.seat_clients[seat]
+        if client is not None:
+            client.send(FEEDBACK_CORRECT if earned else FEEDBACK_WRONG)
+
+    def scoreboard_text(self, title):
+        # The top of the leaderboard, shared by every player in the room.
+        text = f"\n{title}\n"
+        for name, score in self.leaderboard.top(TOP_K):
+            text += f"{name}: {score} pts\n"
+        if len(self.leaderboard) > TOP_K:
+            text += f"... {len(self.leaderboard) - TOP_K} more players\n"
+        return text
+
+    def live_scoreboard(self):
+        return self.scoreboard_text("[LIVE SCORES]")
+
+    def send_ranks(self):
+        # Send each player their own standing, but only when it changed since last time.
+        total = len(self.leaderboard)
+        for client, nickname in list(self.clients.items()):
+            standing = (self.leaderboard.rank(nickname), self.leaderboard.scores[nickname])
+            if self.sent_ranks.get(client) == standing:
+                continue
+            self.sent_ranks[client] = standing
+            client.send(protocol.encode(protocol.RANK, format_rank(standing, total)))
+
+    def rank_text(self, nickname):
+        # A player's own standing, as sent in RANK frames; None once they left.
+        if nickname not in self.leaderboard:
+            return None
+        standing = (self.leaderboard.rank(nickname), self.leaderboard.scores[nickname])
+        return format_rank(standing, len(self.leaderboard))
+
+    def start_quiz(self):
+        # Start the game: the first question opens after a short pause.
+        self.state = RUNNING
+        self.question_index = 0
+        self.record('start')
+        self.prefetch_question()
+        self.timer = self.scheduler.call_later(START_DELAY, self.open_question)
+
+    def journal_state(self):
+        # Plain-data copy of this room for a journal snapshot (see journal.apply).
+        # Answers still waiting are scored first so the snapshot's answers and scores agree.
+        answers = None
+        if self.answered is not None:
+            self.score_batch()
+            answers = {nickname: scoring.CHOICE_LETTERS[self.answered[seat]]
+                       for nickname, seat in self.seats.items() if self.answered[seat]}
+        return {'room': self.room_id, 'questions': self.questions, 'state': self.state,
+                'index': self.question_index, 'scores': dict(self.leaderboard.scores),
+                'answers': answers, 'tokens': {}}
+
+    def restore(self, state):
+        # Continue a game recovered from the journal. Every player starts out away and
+        # gets their seat back by resuming; a question open at the crash is asked again.
+        self.state = RUNNING
+        self.question_index = state['index']
+        for nickname, score in state['scores'].items():
+            self.leaderboard.add(nickname, score)
+            self.away.add(nickname)
+            self.seats[nickname] = len(self.seat_names)
+            self.seat_names.append(nickname)
+            self.seat_clients.append(None)
+        log(f"[ROOM {self.room_id}] Recovered at question {self.question_index + 1} "
+            f"with {len(self.away)} players away.")
+        if state['answers'] is not None:
+            self.open_question(answers=state['answers'])
+        else:
+            self.timer = self.scheduler.call_later(START_DELAY, self.open_question)
+
+    def prefetch_question(self):
+        # Send the upcoming question sealed, during the pause before it opens.
+        if self.question_index >= len(self.questions):
+            return
+        index = self.question_index
+        text = format_question(index, self.questions[index])
+        key = prefetch.new_key()
+        payload = prefetch.seal(index, text, key)
+        self.prefetched = (index, text, key, payload)
+        self.broadcast(protocol.PREFETCH, payload)
+
+    def open_question(self, answers=None):
+        # Reveal the prefetched question to all players and schedule its deadline.
+        # answers carries over answers already given when a recovered room asks a question again.
+        if self.question_index >= len(self.questions) or not (self.clients or self.away):
+            self.finish()
+            return
+        if self.prefetched is None or self.prefetched[0] != self.question_index:
+            self.prefetch_question()    # A recovered room opens without a pause before it
+        index, q_text, key, _ = self.prefetched
+        self.prefetched = None
+        q = self.questions[index]
+        # Answers given before a restart were scored already; they only block a second answer
+        self.answered = bytearray(len(self.seat_names))
+        self.answer_count = 0
+        for nickname, letter in (answers or {}).items():
+            if nickname in self.seats:
+                self.answered[self.seats[nickname]] = scoring.choice_code(letter)
+                self.answer_count += 1
+        self.correct_code = scoring.choice_code(q['answer'])
+        self.question_text = q_text
+        self.opened_at = self.scheduler.now()
+        if answers is None:
+            self.record('question', index=self.question_index)
+        else:
+            self.record('question', index=self.question_index, resumed=True)
+        self.broadcast(protocol.REVEAL, prefetch.reveal(index, key, QUESTION_TIME_LIMIT), stamped=True)
+        self.audience.publish(protocol.QUESTION, q_text)
+        # Every player counts QUESTION_TIME_LIMIT from their own receipt; stay open for the slowest link
+        grace = max(map(latency.compensation, self.clients), default=0.0)
+        self.timer = self.scheduler.call_at(self.opened_at + QUESTION_TIME_LIMIT + grace, self.close_question)
+
+    def close_question(self):
+        # Close the round when time is up or everyone has answered.
+        if self.answered is None:
+            return
+        self.scheduler.cancel(self.timer)
+        self.score_batch()
+        self.answered = self.correct_code = self.question_text = None
+        metrics.ROUND_SECONDS.observe(self.scheduler.now() - self.opened_at)
+        self.record('close')
+        self.audience.publish(protocol.STATUS, f"⌛ Time's up for question {self.question_index + 1}.")
+        if self.audience.viewers:
+            self.audience.scores_changed()
+
+        # Broadcast the scoreboard to everyone, then wait a bit before the next question
+        self.broadcast(protocol.SCORE, self.scoreboard_text("[SCOREBOARD]"), droppable=True)
+        self.send_ranks()
+        self.question_index += 1
+        self.prefetch_question()
+        self.timer = self.scheduler.call_later(QUESTION_GAP, self.open_question)
+
+    def finish(self):
+        # Final scores and winner announcement
+        final_text = self.scoreboard_text("🏁 FINAL SCORES 🏁")
+        winners = self.leaderboard.leaders()
+        if len(winners) == 1:
+            final_text += f"\n🏆 Winner: {winners[0]} 🏆"
+        elif len(winners) > TOP_K:
+            final_text += f"\n🤝 It's a draw between {len(winners)} players"
+        elif winners:
+            final_text += f"\n🤝 It's a draw between: {', '.join(winners)}"
+        self.final_text = final_text
+        self.record('end', standings=self.leaderboard.top(len(self.leaderboard)))
+        self.broadcast(protocol.FINAL, final_text)
+        self.audience.stop()
+        self.audience.publish(protocol.FINAL, final_text)
+        self.audience.close()   # Nothing more to watch; relays see their upstream end and drop the feed
+        self.sent_ranks.clear()
+        self.send_ranks()
+        self.state = FINISHED
+        self.timer = None
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+class Lobby:
+    # Matchmaker: fills rooms of min_players..max_players and starts each one independently.
+
+    def __init__(self, bank, scheduler, min_players=MIN_PLAYERS, max_players=MAX_PLAYERS, fill_time=LOBBY_FILL_TIME,
+                 questions_per_game=QUESTIONS_PER_GAME, category=None, difficulty=None, rng=random, sessions=None,
+                 journal=None, points_mode=scoring.FIXED):
+        self.bank = bank
+        self.scheduler = scheduler
+        self.journal = journal
+        self.points_mode = points_mode
+        self.sessions = sessions if sessions is not None else SessionTable(scheduler)
+        self.questions_per_game = questions_per_game
+        self.category = category        # Only draw questions from this category (None for any)
+        self.difficulty = difficulty    # Only draw questions of this difficulty (None for any)
+        self.rng = rng                  # Source of randomness for question draws
+        self.min_players = min_players
+        self.max_players = max_players
+        self.fill_time = fill_time
+        self.rooms = {}         # Maps room ids to rooms that are waiting or running
+        self.open_room = None   # The room new players are currently placed in
+        self.fill_timer = None  # Pending start of open_room once it reached min_players
+        self.last_room_id = 0
+
+    def join(self, client, nickname):
+        # Place a player in the open room, opening a new one if needed.
+        room = self.open_room
+        if room is None or room.state != WAITING or room.is_full():
+            questions = self.bank.sample(self.questions_per_game, self.category, self.difficulty, self.rng)
+            self.last_room_id += 1
+            room = GameRoom(self.last_room_id, questions, self.scheduler, self.min_players, self.max_players,
+                            on_finish=self.room_finished, journal=self.journal, points_mode=self.points_mode)
+            room.record('open', questions=questions)
+            self.rooms[room.room_id] = room
+            self.open_room = room
+            self.cancel_fill_timer()
+
+        nickname = room.add_player(client, nickname)
+        if room.is_full():
+            self.start_room(room)
+        elif len(room.clients) >= self.min_players and self.fill_time > 0:
+            if self.fill_timer is None:
+                self.fill_timer = self.scheduler.call_later(self.fill_time, self.start_room, room)
+            room.broadcast_status(starting_in=self.fill_time)
+        elif len(room.clients) >= self.min_players:
+            self.start_room(room)
+        else:
+            room.broadcast_status()
+        return room, nickname
+
+    def resume(self, client, token):
+        # Put a reconnecting player back in their held seat; returns the room, or None for an unknown token.
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        if session.client is not None:
+            # The old connection has not noticed it is dead yet; the new one takes over
+            old = session.client
+            session.room.suspend_player(old)
+            old.close()
+        if not session.room.resume_player(client, session.nickname):
+            self.sessions.close(session)
+            return None
+        self.sessions.attach(session, client)
+        return session.room
+
+    def leave(self, room, client, token=None):
+        # Remove a player; a waiting room that drops below min_players stops its countdown.
+        # A player who drops out of a running game keeps their seat for the session grace period.
+        session = self.sessions.get(token)
+        if session is not None and session.client is not client:
+            return  # This connection was already replaced by a resumed one
+        if session is not None and room.state == RUNNING:
+            room.suspend_player(client)
+            self.sessions.detach(session, self.session_expired)
+            return
+        self.sessions.close(session)
+        room.remove_player(client)
+        if room.state == WAITING:
+            if room is self.open_room and len(room.clients) < self.min_players:
+                self.cancel_fill_timer()
+            if room.clients:
+                room.broadcast_status()
+            elif room is not self.open_room:
+                self.rooms.pop(room.room_id, None)
+                room.audience.close()
+
+    def spectate(self, client, label):
+        # Add a spectator to the room labelled "[worker.]room id", or to the newest room for an
+        # empty label; returns the room, or None if there is no such room.
+        _, _, room_id = label.rpartition(".")
+        if room_id:
+            room = self.rooms.get(int(room_id)) if room_id.isdigit() else None
+        else:
+            room = self.rooms[max(self.rooms)] if self.rooms else None
+        if room is None:
+            return None
+        client.send(protocol.encode(protocol.STATUS, f"👀 Watching room {self.room_label(room)}"))
+        room.audience.add(client)
+        return room
+
+    def room_label(self, room):
+        # Room id as spectators give it; under the supervisor it names the worker too, like resume tokens.
+        return f"{self.sessions.prefix}{room.room_id}"
+
+    def session_expired(self, session):
+        session.room.drop_player(session.nickname)
+
+    def cancel_fill_timer(self):
+        self.scheduler.cancel(self.fill_timer)
+        self.fill_timer = None
+
+    def start_room(self, room):
+        # Close the room to new players and start its game.
+        if room.state != WAITING:
+            return
+        if room is self.open_room:
+            self.open_room = None
+            self.cancel_fill_timer()
+        room.state = RUNNING
+        room.broadcast_status()
+        log(f"[ROOM {self.room_label(room)}] Starting with {len(room.clients)} players. Active rooms: {len(self.rooms)}")
+        room.start_quiz()
+
+    def journal_state(self):
+        # Snapshot of every open room and the tokens of their players.
+        states = {room_id: room.journal_state() for room_id, room in self.rooms.items()}
+        for session in self.sessions.sessions.values():
+            state = states.get(session.room.room_id)
+            if state is not None and session.room is self.rooms[session.room.room_id]:
+                state['tokens'][session.nickname] = session.token
+        return {'last_room': self.last_room_id, 'rooms': list(states.values())}
+
+    def restore(self, states, last_room_id):
+        # Bring back games recovered from the journal; players return with their old tokens.
+        self.last_room_id = max(self.last_room_id, last_room_id)
+        for state in states:
+            room = GameRoom(state['room'], state['questions'], self.scheduler, self.min_players, self.max_players,
+                            on_finish=self.room_finished, journal=self.journal, points_mode=self.points_mode)
+            self.rooms[room.room_id] = room
+            for nickname, token in state['tokens'].items():
+                if nickname in state['scores']:
+                    session = self.sessions.restore(token, room, nickname)
+                    self.sessions.detach(session, self.session_expired)
+            room.restore(state)
+
+    def room_finished(self, room):
+        self.rooms.pop(room.room_id, None)
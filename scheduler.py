@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import time
+import traceback
+
+# Central deadline scheduler for every game in the process.
+#
+# All question rounds, gaps between questions and lobby countdowns are timers in
+# one heap keyed by a monotonic deadline. On a running event loop only a single
+# loop timer is armed, for the earliest deadline, so idle games cost nothing and
+# a round closes as soon as its deadline passes rather than on the next tick.
+# A callback that raises is logged and skipped; the timers due with it still
+# run and the loop timer is re-armed, so one broken room cannot stall the rest.
+
+COMPACT_RATIO = 0.5     # Rebuild the heap once this share of it is cancelled timers
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+class Scheduler:
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []              # (deadline, sequence, timer)
+        self.sequence = itertools.count()
+        self.cancelled = 0          # Cancelled timers still sitting in the heap
+        self.loop = None
+        self.handle = None          # Loop timer armed for the earliest deadline
+        self.armed_for = None
+
+    def now(self):
+        return self.clock()
+
+    def attach(self, loop):
+        # Drive the timers from an asyncio loop (whose clock must be time.monotonic).
+        self.loop = loop
+        self.rearm()
+
+    def call_at(self, deadline, callback, *args):
+        timer = Timer(deadline, callback, args)
+        heapq.heappush(self.heap, (deadline, next(self.sequence), timer))
+        if self.armed_for is None or deadline < self.armed_for:
+            self.rearm()
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, timer):
+        if timer is not None and not timer.cancelled:
+            timer.cancelled = True
+            self.cancelled += 1
+            if self.cancelled > len(self.heap) * COMPACT_RATIO:
+                self.compact()
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+        heapq.heapify(self.heap)
+        self.cancelled = 0
+
+    def next_deadline(self):
+        # Earliest live deadline, or None when nothing is scheduled.
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+            self.cancelled -= 1
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self, now=None):
+        # Run every timer whose deadline has passed; returns how many ran.
+        if now is None:
+            now = self.clock()
+        ran = 0
+        while self.heap and self.heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self.heap)
+            if timer.cancelled:
+                self.cancelled -= 1
+                continue
+            timer.cancelled = True  # Fired timers count as done for later cancel() calls
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                print(f"[SCHEDULER] Timer callback {getattr(timer.callback, '__qualname__', timer.callback)} failed:")
+                traceback.print_exc()
+            ran += 1
+        return ran
+
+    def rearm(self):
+        # Point the single loop timer at the earliest deadline.
+        if self.loop is None:
+            return
+        deadline = self.next_deadline()
+        if deadline == self.armed_for:
+            return
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        self.armed_for = deadline
+        if deadline is not None:
+            self.handle = self.loop.call_at(deadline, self.fire)
+
+    def fire(self):
+        self.handle = None
+        self.armed_for = None
+        try:
+            self.run_due()
+        finally:
+            self.rearm()
@@ -0,0 +1,84 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:  # Optional; the array-module path below gives the same results
+    numpy = None
+
+# Batch scoring of answers.
+#
+# Receiving an answer only appends three numbers to compact columns (player
+# seat, choice code, seconds since the question opened). The answers gathered
+# so far are scored together at micro-batch boundaries and when the round
+# closes, so the per-answer work in the read path stays a few array appends
+# even in rooms with tens of thousands of players.
+#
+# With NumPy installed the columns are viewed in place and scored as vectors;
+# without it the fixed-points mode still runs in C through bytes.translate.
+
+# Points modes
+FIXED = "fixed"             # One point per correct answer
+TIME_DECAY = "time_decay"   # Faster correct answers earn more points
+
+DECAY_MAX_POINTS = 1000     # Points for an instant correct answer in TIME_DECAY mode
+DECAY_MIN_POINTS = 500      # Points for a correct answer at the last moment
+
+# Choice codes; 0 means "not answered" in per-seat tables
+CHOICE_CODES = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+INVALID = 5
+CHOICE_LETTERS = "-ABCD?"
+
+# bytes.translate tables mapping the correct choice code to 1 and every other code to 0
+CORRECT_TABLES = [bytes(1 if code == correct else 0 for code in range(256)) for correct in range(INVALID + 1)]
+
+def choice_code(answer):
+    code = CHOICE_CODES.get(answer)
+    if code is None:
+        code = CHOICE_CODES.get(answer.strip().upper(), INVALID)
+    return code
+
+class AnswerColumns:
+    # Answers not scored yet, one entry per answer across three parallel arrays.
+    __slots__ = ('seats', 'choices', 'elapsed')
+
+    def __init__(self):
+        self.seats = array('I')
+        self.choices = array('B')
+        self.elapsed = array('d')
+
+    def __len__(self):
+        return len(self.seats)
+
+    def append(self, seat, choice, elapsed):
+        self.seats.append(seat)
+        self.choices.append(choice)
+        self.elapsed.append(elapsed)
+
+    def clear(self):
+        del self.seats[:]
+        del self.choices[:]
+        del self.elapsed[:]
+
+def score_one(choice, elapsed, correct, time_limit, mode=FIXED):
+    # Points for a single answer; the scalar form of score() for rooms too small to batch.
+    if choice != correct:
+        return 0
+    if mode == FIXED:
+        return 1
+    return round(DECAY_MAX_POINTS - (DECAY_MAX_POINTS - DECAY_MIN_POINTS) * min(1.0, max(0.0, elapsed / time_limit)))
+
+def score(columns, correct, time_limit, mode=FIXED):
+    # Points earned by every answer in columns, as a list in the same order.
+    if mode == FIXED:
+        if numpy is not None:
+            return (numpy.frombuffer(columns.choices, dtype=numpy.uint8) == correct).astype(numpy.int32).tolist()
+        return list(columns.choices.tobytes().translate(CORRECT_TABLES[correct]))
+
+    span = DECAY_MAX_POINTS - DECAY_MIN_POINTS
+    if numpy is not None:
+        choices = numpy.frombuffer(columns.choices, dtype=numpy.uint8)
+        share = numpy.clip(numpy.frombuffer(columns.elapsed, dtype=numpy.float64) / time_limit, 0.0, 1.0)
+        points = numpy.rint(DECAY_MAX_POINTS - span * share).astype(numpy.int32)
+        return numpy.where(choices == correct, points, 0).tolist()
+    return [round(DECAY_MAX_POINTS - span * min(1.0, max(0.0, elapsed / time_limit))) if choice == correct else 0
+            for choice, elapsed in zip(columns.choices, columns.elapsed)]
@@ -1,166 +1,334 @@
+import asyncio
+import os
 import socket
-import threading
-import json
 import time
-import select
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import admission
+import fanout
+import journal
+import latency
+import metrics
+import protocol
+import scoring
+from fanout import ClientConnection
+from question_bank import QuestionBank, ensure_built
+from rooms import LOBBY_FILL_TIME, MAX_PLAYERS, MIN_PLAYERS, Lobby
+from scheduler import Scheduler
+from sessions import SessionTable, worker_of
 
 # Server configuration
 HOST = '127.0.0.1'
 PORT = 5002
+LISTEN_BACKLOG = 4096   # Pending connections the kernel may queue for us
+READ_SIZE = 4096        # Bytes requested per read; frames may span or share reads
+PEEK_SIZE = 256         # Bytes peeked at to spot a RESUME or SPECTATE before routing a connection
+
+# Question source
+QUESTIONS_FILE = 'questions.json'   # Editable source, compiled into QUESTION_BANK at startup
+QUESTION_BANK = 'questions.qbank'
+QUESTION_CATEGORY = None            # Restrict games to one category (None for any)
+QUESTION_DIFFICULTY = None          # Restrict games to one difficulty (None for any)
+POINTS_MODE = scoring.FIXED         # Or scoring.TIME_DECAY to reward fast correct answers
 
-# Client tracking
-clients = {}            # Maps client sockets to nicknames
-scores = {}             # Maps nicknames to their scores
-ready_clients = []      # List of clients who joined and are ready
-quiz_started = False    # Flag to indicate whether the quiz has started
-lock = threading.Lock() # Lock for thread-safe operations
-questions = []          # List to store quiz questions
+# Room sizes; rooms of rooms.BATCH_SCORING_SEATS players or more score answers in batches
+MIN_ROOM_PLAYERS = MIN_PLAYERS      # Players needed before a room's fill countdown starts
+MAX_ROOM_PLAYERS = MAX_PLAYERS      # A room starts at once when this full, e.g. 500 for one large game
+ROOM_FILL_TIME = LOBBY_FILL_TIME    # Seconds a room keeps filling after reaching MIN_ROOM_PLAYERS
 
-# Constants
-QUESTION_TIME_LIMIT = 20  # Time limit for each question in seconds
-MIN_PLAYERS = 3           # Minimum players required to start the quiz
+# Game journal for crash recovery and audits; workers add their id to the file names
+JOURNAL_FILE = 'journal.log'        # Set to None to run without a journal
+SNAPSHOT_FILE = 'journal.snapshot'
+SNAPSHOT_INTERVAL = 10              # Seconds between snapshots of every open room
+
+# Game state
+bank = None             # Memory-mapped question bank shared by all rooms
+lobby = None            # Matchmaker that places players into game rooms
+game_journal = None     # Journal of this process, if enabled
+scheduler = Scheduler() # Timers for every room's rounds and lobby countdowns
+gate = admission.Admission()    # Connection ceilings and per-address rate limits
+pinger = latency.Pinger(scheduler)  # RTT and clock offset of every joined connection
+tasks = set()           # Client tasks started outside asyncio.start_server
 
 def load_questions():
-    # Load quiz questions from a JSON file.
-    with open('questions.json', 'r') as file:
-        return json.load(file)
+    # Open the compiled question bank, compiling it first if the JSON source changed.
+    if os.path.exists(QUESTIONS_FILE):
+        ensure_built(QUESTIONS_FILE, QUESTION_BANK)
+    return QuestionBank(QUESTION_BANK)
 
-def broadcast(message):
-    # Send a message to all connected clients.
-    for client in list(clients.keys()):
-        try:
-            client.sendall(message.encode())
-        except:
-            remove_client(client)
-
-def remove_client(client_socket):
-    # Remove a disconnected client and clean up related data.
-    with lock:
-        if client_socket in clients:
-            nickname = clients[client_socket]
-            print(f"[-] {nickname} disconnected.")
-            del clients[client_socket]
-            del scores[nickname]
-            if client_socket in ready_clients:
-                ready_clients.remove(client_socket)
-
-def handle_client(client_socket):
-    # Handle a newly connected client.
-    global quiz_started
+def raise_fd_limit():
+    # Raise the open file limit to the hard maximum so we can hold many sockets.
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+def peer_address(peer):
+    return peer[0] if peer else ""
+
+def handshake_expired(client):
+    # The client connected but never said who it is.
+    metrics.HANDSHAKE_TIMEOUTS.inc()
+    client.close()
+
+async def handle_client(reader, writer, checked=False, handshake_by=None):
+    # Handle a newly connected client for the lifetime of its connection.
+    # checked is set when the accept loop already admitted and counted the connection;
+    # handshake_by is then the scheduler time its handshake allowance, started at accept, runs out.
+    if not checked:
+        reason = gate.check(peer_address(writer.get_extra_info("peername")))
+        if reason is not None:
+            writer.write(protocol.encode(protocol.REJECT, reason))
+            writer.close()
+            return
+        gate.opened()
+    if handshake_by is None:
+        handshake_by = scheduler.now() + admission.HANDSHAKE_TIMEOUT
+    client = ClientConnection(writer)
+    room = None
+    watching = None     # Room this connection spectates, if it is a spectator
+    token = None
+    decoder = protocol.FrameDecoder(admission.HANDSHAKE_MAX_PAYLOAD)
+    accepted = time.perf_counter()
+    deadline = scheduler.call_at(handshake_by, handshake_expired, client)
+    metrics.CONNECTED_CLIENTS.inc()
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            for msg_type, payload in decoder.feed(data):
+                if watching is not None:
+                    continue    # Spectators only listen
+                if room is None:
+                    # The first frame must carry the nickname, a token to resume a held seat, or a room to watch
+                    if msg_type == protocol.NICK:
+                        room, nickname = lobby.join(client, payload)
+                        token = lobby.sessions.open(room, nickname, client)
+                        client.send(protocol.encode(protocol.SESSION, token))
+                        metrics.JOIN_SECONDS.observe(time.perf_counter() - accepted)
+                    elif msg_type == protocol.RESUME:
+                        room = lobby.resume(client, payload)
+                        # An empty SESSION tells the client to join as a new player instead
+                        token = payload if room is not None else None
+                        if room is None:
+                            client.send(protocol.encode(protocol.SESSION, ""))
+                    elif msg_type == protocol.SPECTATE:
+                        watching = lobby.spectate(client, payload)
+                        if watching is None:
+                            client.send(protocol.encode(protocol.REJECT, f"No room {payload} to watch."))
+                            raise protocol.ProtocolError("Unknown room to spectate")
+                        scheduler.cancel(deadline)     # Input stays capped: whatever they send is ignored
+                        gate.joined()
+                    else:
+                        raise protocol.ProtocolError("Expected a nickname first")
+                    if room is not None:
+                        scheduler.cancel(deadline)
+                        decoder.max_payload = protocol.MAX_PAYLOAD
+                        gate.joined()
+                        pinger.add(client)
+                elif msg_type == protocol.ANSWER:
+                    # Answers only count before the player's deadline
+                    room.record_answer(client, payload)
+                elif msg_type == protocol.PONG:
+                    pinger.pong(client, payload)
+    except (ConnectionError, OSError, protocol.ProtocolError):
+        pass
+    finally:
+        if room is not None:
+            pinger.discard(client)
+            lobby.leave(room, client, token)
+        elif watching is not None:
+            watching.audience.remove(client)
+        else:
+            scheduler.cancel(deadline)
+        gate.closed(joined=room is not None or watching is not None)
+        client.close()
+        metrics.CONNECTED_CLIENTS.dec()
+
+async def start_client(sock, handshake_by):
+    # Run an already accepted, admitted and counted socket through the normal client handler.
+    try:
+        reader, writer = await asyncio.open_connection(sock=sock)
+    except OSError:
+        gate.closed(joined=False)
+        sock.close()
+        return
+    await handle_client(reader, writer, checked=True, handshake_by=handshake_by)
+
+def adopt_client(sock, handshake_by):
+    # A socket another worker accepted and passed on: count it here, it keeps the handshake time it had left.
+    gate.opened()
+    spawn(start_client(sock, handshake_by))
+
+def reject_socket(sock, reason):
+    # Refuse a raw accepted socket with one small frame; never waits on a slow peer.
+    try:
+        sock.send(protocol.encode(protocol.REJECT, reason))
+    except OSError:
+        pass
+    sock.close()
+
+async def wait_readable(sock):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    loop.add_reader(sock.fileno(), lambda: future.done() or future.set_result(None))
     try:
-        # Receive the nickname from the client
-        nickname = client_socket.recv(1024).decode()
-        with lock:
-            # Register the client
-            clients[client_socket] = nickname
-            scores[nickname] = 0
-            ready_clients.append(client_socket)
-            print(f"[+] {nickname} joined. Total players: {len(ready_clients)}")
-
-            # Notify clients of current status
-            needed = max(0, MIN_PLAYERS - len(ready_clients))
-            if needed > 0:
-                status = f"⏳ {len(ready_clients)}/{MIN_PLAYERS} players connected. Waiting for {needed} more..."
-            else:
-                status = f"✅ {len(ready_clients)}/{MIN_PLAYERS} players connected. Starting quiz..."
-            broadcast("STATUS||" + status)
-
-            # Start quiz if enough players are connected
-            if not quiz_started and len(ready_clients) >= MIN_PLAYERS:
-                quiz_started = True
-                threading.Thread(target=start_quiz, daemon=True).start()
-    except:
-        remove_client(client_socket)
-
-def collect_answers(timeout_seconds, correct_answer):
-    # Collect answers from all clients within a time limit.
-    answers = {}
-    start_time = time.time()
-
-    while time.time() - start_time < timeout_seconds:
-        if len(answers) >= len(clients):
-            break
+        await future
+    finally:
+        loop.remove_reader(sock.fileno())
 
+async def peek_route_label(sock):
+    # Return the token or room label if the client opens with RESUME or SPECTATE, without consuming any bytes.
+    seen = 0
+    try:
+        while True:
+            try:
+                data = sock.recv(PEEK_SIZE, socket.MSG_PEEK)
+            except BlockingIOError:
+                await wait_readable(sock)
+                continue
+            if len(data) <= seen:
+                return None     # Woken without new bytes: the peer hung up mid-frame
+            seen = len(data)
+            needed = protocol.HEADER.size
+            if len(data) >= needed:
+                _, msg_type, length = protocol.HEADER.unpack_from(data)
+                needed += length
+                if msg_type not in (protocol.RESUME, protocol.SPECTATE) or needed > PEEK_SIZE:
+                    return None
+                if len(data) >= needed:
+                    return data[protocol.HEADER.size:needed].decode(errors='replace')
+            # Part of the first frame is here; peeked bytes keep the socket readable,
+            # so have the kernel report it only once the whole frame has arrived
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, needed)
+            await wait_readable(sock)
+    finally:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, 1)
+
+async def route_client(sock, coordinator):
+    # Keep the client if its room is filling on this worker, otherwise pass it on unread.
+    # A resuming player goes straight to the worker that holds their seat, a spectator to the one running the room.
+    # The connection was counted as pending at accept; its handshake allowance runs from then.
+    handshake_by = scheduler.now() + admission.HANDSHAKE_TIMEOUT
+    try:
+        label = await asyncio.wait_for(peek_route_label(sock), admission.HANDSHAKE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.HANDSHAKE_TIMEOUTS.inc()
+        gate.closed(joined=False)
+        sock.close()
+        return
+    except OSError:
+        gate.closed(joined=False)
+        sock.close()
+        return
+    if label is not None and worker_of(label) is not None:
+        worker = worker_of(label)
+    else:
         try:
-            remaining = timeout_seconds - (time.time() - start_time)
-            if remaining <= 0:
-                break
+            worker = await coordinator.route()
+        except ConnectionError:
+            worker = None
+    if worker is None or worker == coordinator.worker_id:
+        await start_client(sock, handshake_by)
+    else:
+        # The receiving worker counts it from here on
+        coordinator.hand_off(sock, worker, handshake_by)
+        gate.closed(joined=False)
+        sock.close()
 
-            # Wait for readable client sockets
-            readable, _, _ = select.select(list(clients.keys()), [], [], 1)
-            for sock in readable:
-                try:
-                    data = sock.recv(1024)
-                    if data:
-                        answer = data.decode().strip().upper()
-                        if sock not in answers:
-                            answers[sock] = answer
-                            # Only send feedback to the client who answered
-                            nickname = clients.get(sock)
-                            if nickname and answer == correct_answer:
-                                scores[nickname] += 1
-                                sock.sendall("FEEDBACK||CORRECT".encode())
-                            else:
-                                sock.sendall("FEEDBACK||WRONG".encode())
-                except:
-                    continue
-        except:
-            break
-
-    # After all answers are collected or time is up, broadcast the scoreboard to everyone
-    with lock:
-        score_text = "\n[SCOREBOARD]\n"
-        for name, score in sorted(scores.items(), key=lambda x: (-x[1], x[0])):
-            score_text += f"{name}: {score} pts\n"
-    broadcast("SCORE||" + score_text)
-
-    return answers
-
-def start_quiz():
-    # Main quiz logic: send questions, collect answers, update scores.
-    time.sleep(1)
-    for idx, q in enumerate(questions):
-        # Send question to all clients
-        q_text = f"\n❓ Question {idx+1}: {q['question']}\nA) {q['A']}  B) {q['B']}  C) {q['C']}  D) {q['D']}\n⏱️ You have {QUESTION_TIME_LIMIT} seconds!"
-        broadcast("QUESTION||" + q_text)
-
-        # Collect and evaluate answers
-        answers = collect_answers(QUESTION_TIME_LIMIT, q['answer'])
-        
-        # Wait a bit before next question
-        time.sleep(2)
-
-    # Final scores and winner announcement
-    with lock:
-        final_text = "\n🏁 FINAL SCORES 🏁\n"
-        for name, score in sorted(scores.items(), key=lambda x: (-x[1], x[0])):
-            final_text += f"{name}: {score} pts\n"
-        top_score = max(scores.values())
-        winners = [name for name, score in scores.items() if score == top_score]
-        if len(winners) == 1:
-            final_text += f"\n🏆 Winner: {winners[0]} 🏆"
+def spawn(coro):
+    # Start a background task and keep a reference to it until it finishes.
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+async def serve(listener=None, coordinator=None, metrics_port=metrics.METRICS_PORT):
+    # Run the accept loop on a single event loop; every client is a coroutine.
+    scheduler.attach(asyncio.get_running_loop())
+    metrics.ROOMS.read = lambda: len(lobby.rooms)
+    metrics.SEND_BACKLOG.read = lambda: sum(fanout.queue_depths(pinger.clients).values())
+    metrics.MAX_SEND_BACKLOG.read = lambda: max(fanout.queue_depths(pinger.clients).values(), default=0)
+    metrics.link_report = pinger.report
+    await metrics.start_endpoint(metrics_port)
+    pinger.start()
+    if coordinator is None:
+        if listener is None:
+            server = await asyncio.start_server(handle_client, HOST, PORT, backlog=LISTEN_BACKLOG)
         else:
-            final_text += f"\n🤝 It's a draw between: {', '.join(winners)}"
-        broadcast("FINAL||" + final_text)
+            server = await asyncio.start_server(handle_client, sock=listener)
+        print(f"[SERVER] Running on {HOST}:{PORT}")
+        async with server:
+            await server.serve_forever()
+
+    # Worker mode: the coordinator decides which process each new client belongs to
+    coordinator.attach(adopt_client)
+    loop = asyncio.get_running_loop()
+    while True:
+        sock, address = await loop.sock_accept(listener)
+        reason = gate.check(peer_address(address))
+        if reason is not None:
+            reject_socket(sock, reason)
+            continue
+        gate.opened()
+        spawn(route_client(sock, coordinator))
+
+def journal_paths(worker_id):
+    if worker_id is None:
+        return JOURNAL_FILE, SNAPSHOT_FILE
+    return (f"{os.path.splitext(JOURNAL_FILE)[0]}-{worker_id}.log",
+            f"{os.path.splitext(SNAPSHOT_FILE)[0]}-{worker_id}.snapshot")
+
+def take_snapshot():
+    # Periodically record every open room, so recovery replays only a short journal tail.
+    game_journal.snapshot(lobby.journal_state())
+    scheduler.call_later(SNAPSHOT_INTERVAL, take_snapshot)
+
+def open_journal(worker_id):
+    # Recover the games a previous run left unfinished, then keep journaling.
+    global game_journal
+    path, snapshot_path = journal_paths(worker_id)
+    running, last_room_id, valid_end = journal.recover(path, snapshot_path)
+    game_journal = journal.Journal(path, snapshot_path, valid_end=valid_end)
+    lobby.journal = lobby.sessions.journal = game_journal
+    if running or last_room_id:
+        lobby.restore(running, last_room_id)
+        print(f"[JOURNAL] Recovered {len(running)} unfinished games from {path}.")
+    take_snapshot()
+
+def setup(worker_id=None):
+    # Load the question bank and create the lobby for this process.
+    global bank, lobby
+    bank = load_questions()
+    lobby = Lobby(bank, scheduler, min_players=MIN_ROOM_PLAYERS, max_players=MAX_ROOM_PLAYERS,
+                  fill_time=ROOM_FILL_TIME, category=QUESTION_CATEGORY, difficulty=QUESTION_DIFFICULTY,
+                  sessions=SessionTable(scheduler, worker_id=worker_id), points_mode=POINTS_MODE)
+    if JOURNAL_FILE is not None:
+        open_journal(worker_id)
+
+def shutdown():
+    # Commit what is left in the journal.
+    if game_journal is not None:
+        game_journal.close()
 
 def main():
     # Start the server and accept incoming client connections.
-    global questions
-    questions = load_questions()
+    setup()
+    print(f"[SERVER] Question bank has {len(bank)} questions.")
+    raise_fd_limit()
 
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind((HOST, PORT))
-    server.listen()
-    print(f"[SERVER] Running on {HOST}:{PORT}")
-
-    while True:
-        try:
-            # Accept a new client
-            client_socket, _ = server.accept()
-            threading.Thread(target=handle_client, args=(client_socket,), daemon=True).start()
-        except KeyboardInterrupt:
-            print("\n[SERVER] Shutting down.")
-            break
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n[SERVER] Shutting down.")
+    finally:
+        shutdown()
 
 if __name__ == "__main__":
     main()
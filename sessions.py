@@ -0,0 +1,88 @@
+import secrets
+
+import metrics
+
+# Resume tokens for players whose connection drops mid-game.
+#
+# Every player gets a random token when they join a room. If their connection
+# drops while the game is running, the room keeps their name and score for
+# RESUME_GRACE seconds. A new connection that presents the token takes the seat
+# back and receives one SNAPSHOT of the round in progress, so a resume costs a
+# single round trip and the rest of the room never waits for it.
+#
+# Tokens start with the id of the worker process that issued them (when running
+# under the supervisor), so a reconnect that lands on another worker can be
+# handed straight to the one holding the seat.
+
+RESUME_GRACE = 30   # Seconds a dropped player's seat and score are held
+TOKEN_BYTES = 16    # Random bytes per token
+
+class Session:
+    __slots__ = ('token', 'room', 'nickname', 'client', 'expiry')
+
+    def __init__(self, token, room, nickname, client):
+        self.token = token
+        self.room = room
+        self.nickname = nickname
+        self.client = client    # Current connection, or None while the player is away
+        self.expiry = None      # Scheduler timer that gives the seat up
+
+class SessionTable:
+    # All resume tokens issued by one process.
+
+    def __init__(self, scheduler, grace=RESUME_GRACE, worker_id=None, journal=None):
+        self.scheduler = scheduler
+        self.grace = grace
+        self.journal = journal      # Tokens are journaled so a recovered game can be resumed
+        self.prefix = "" if worker_id is None else f"{worker_id}."
+        self.sessions = {}      # Maps tokens to sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def open(self, room, nickname, client):
+        # Issue a token for a player who just joined a room.
+        token = self.prefix + secrets.token_urlsafe(TOKEN_BYTES)
+        self.sessions[token] = Session(token, room, nickname, client)
+        if self.journal is not None:
+            self.journal.append('session', room=room.room_id, nick=nickname, token=token)
+        return token
+
+    def restore(self, token, room, nickname):
+        # Re-register a token recovered from the journal; its player is away until they resume.
+        session = Session(token, room, nickname, None)
+        self.sessions[token] = session
+        return session
+
+    def get(self, token):
+        return self.sessions.get(token) if token else None
+
+    def detach(self, session, on_expire):
+        # The player's connection is gone; call on_expire(session) unless they resume in time.
+        session.client = None
+        session.expiry = self.scheduler.call_later(self.grace, self.expire, session, on_expire)
+
+    def attach(self, session, client):
+        # A reconnecting player presented the token: bind it to the new connection.
+        self.scheduler.cancel(session.expiry)
+        session.expiry = None
+        session.client = client
+        metrics.RESUMES.inc()
+
+    def expire(self, session, on_expire):
+        if self.sessions.pop(session.token, None) is not None:
+            metrics.EXPIRED_SESSIONS.inc()
+            on_expire(session)
+
+    def close(self, session):
+        # Forget a token for good, e.g. after its player left a room that was not running.
+        if session is not None:
+            self.scheduler.cancel(session.expiry)
+            self.sessions.pop(session.token, None)
+
+def worker_of(token):
+    # The worker id a token was issued by, or None for single-process tokens.
+    prefix, dot, _ = token.partition(".")
+    if not dot or not prefix.isdigit():
+        return None
+    return int(prefix)
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import prefetch
+import protocol
+import rooms
+from bot_client import CHOICES, QUESTION_PATTERN
+from scheduler import Scheduler
+
+# Virtual-time simulation of complete games.
+#
+# The real Lobby and GameRoom run unchanged, but their scheduler reads a virtual
+# clock that jumps straight to the next deadline, and players are in-process
+# objects that receive the encoded frames directly instead of over a socket.
+# An 8-player game that takes minutes in real time therefore runs in about 3 ms
+# of CPU (some 330 games per second per core, most of it spent in the real room
+# code), and with a seed the outcome of every game is reproducible. Players of a
+# room share the work of opening each revealed question (RevealedQuestions).
+#
+# Games are simulated in fixed-size shards, each seeded from (seed, shard number),
+# so the results depend only on the seed and game count; --jobs spreads the
+# shards over several processes without changing the outcome.
+#
+#   python simulation.py --games 5000 --players 8 --seed 42 --jobs 4
+
+SHARD_GAMES = 250   # Games per independently seeded shard
+
+class VirtualClock:
+    # A clock that only moves when the simulation advances it.
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, deadline):
+        self.now = max(self.now, deadline)
+
+class MemoryBank:
+    # Question source with the same sample() interface as QuestionBank.
+
+    def __init__(self, questions):
+        self.questions = questions
+
+    def __len__(self):
+        return len(self.questions)
+
+    def sample(self, k, category=None, difficulty=None, rng=random):
+        matching = [q for q in self.questions
+                    if (category is None or q.get('category', 'general') == category)
+                    and (difficulty is None or q.get('difficulty', 'medium') == difficulty)]
+        return rng.sample(matching, min(k, len(matching)))
+
+class SimConnection:
+    # In-process stand-in for fanout.ClientConnection; frames go straight to the player.
+
+    def __init__(self, player):
+        self.player = player
+        self.peer = ('sim', player.nickname)
+        self.closed = False
+        self.evicted = False
+        self.dropped = 0
+        self.link = None    # No network, so nothing to measure or compensate
+
+    def send(self, data, droppable=False):
+        if self.closed:
+            return False
+        self.player.receive(data)
+        return True
+
+    def queue_depth(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+class RevealedQuestions:
+    # Correct answers of the questions opened so far, shared by every simulated player.
+    #
+    # A room seals each question with its own random key and sends all its players
+    # the same REVEAL frame, so the first player to get it decrypts the question and
+    # looks up the answer, and the rest of the room reuses that by the frame's bytes.
+
+    def __init__(self, answer_key):
+        self.answer_key = answer_key
+        self.answers = {}   # Maps REVEAL payloads to the correct choice, or None if unknown
+
+    def open(self, sealed, reveal):
+        # Correct choice for the question a REVEAL opens, given the PREFETCH payload it belongs to.
+        try:
+            return self.answers[reveal]
+        except KeyError:
+            pass
+        cache = prefetch.PrefetchCache()
+        cache.store(sealed.decode())
+        text, _ = cache.open(reveal.decode())
+        match = QUESTION_PATTERN.search(text)
+        correct = self.answers[reveal] = self.answer_key.get(match.group(1)) if match else None
+        return correct
+
+class SimPlayer:
+    # Answers each question after a think time drawn from its own seeded generator.
+
+    def __init__(self, nickname, scheduler, revealed, accuracy, think_time, rng):
+        self.nickname = nickname
+        self.scheduler = scheduler
+        self.revealed = revealed
+        self.accuracy = accuracy
+        self.think_time = think_time
+        self.rng = rng
+        self.connection = SimConnection(self)
+        self.room = None
+        self.sealed = {}        # Maps question numbers to PREFETCH payloads, still undecoded
+        self.final = None
+        self.correct = 0
+
+    def receive(self, data):
+        # Walk the frame headers directly; only questions, feedback and final scores need decoding.
+        offset = 0
+        end = len(data)
+        while offset < end:
+            _, msg_type, length = protocol.HEADER.unpack_from(data, offset)
+            offset += protocol.HEADER.size
+            if msg_type == protocol.PREFETCH:
+                payload = data[offset:offset + length]
+                self.sealed[payload[:payload.find(b" ")]] = payload
+            elif msg_type == protocol.REVEAL:
+                payload = data[offset:offset + length]
+                sealed = self.sealed.pop(payload[:payload.find(b" ")], None)
+                if sealed is not None:
+                    self.on_question(self.revealed.open(sealed, payload))
+            elif msg_type == protocol.FEEDBACK and data[offset:offset + length] == b"CORRECT":
+                self.correct += 1
+            elif msg_type == protocol.FINAL:
+                self.final = data[offset:offset + length].decode()
+            offset += length
+
+    def on_question(self, correct):
+        if correct and self.rng.random() < self.accuracy:
+            choice = correct
+        else:
+            choice = self.rng.choice([c for c in CHOICES if c != correct])
+        self.scheduler.call_later(self.rng.uniform(*self.think_time), self.answer, choice)
+
+    def answer(self, choice):
+        if self.room is not None and not self.connection.closed:
+            self.room.record_answer(self.connection, choice)
+
+def run_until_idle(scheduler, clock):
+    # Jump from deadline to deadline until no timers remain.
+    steps = 0
+    while True:
+        deadline = scheduler.next_deadline()
+        if deadline is None:
+            return steps
+        clock.advance_to(deadline)
+        steps += scheduler.run_due(clock.now)
+
+def simulate(questions, games, players_per_game, seed=0, accuracy=0.7, think_time=(0.5, 15.0)):
+    # Play `games` complete games in virtual time; returns per-room final standings.
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    lobby = rooms.Lobby(MemoryBank(questions), scheduler, min_players=min(rooms.MIN_PLAYERS, players_per_game),
+                        max_players=players_per_game, rng=rng)
+    revealed = RevealedQuestions({q['question']: q['answer'] for q in questions})
+
+    played = {}     # Maps room ids to rooms, in the order they were opened
+    for game in range(games):
+        for seat in range(players_per_game):
+            player = SimPlayer(f"g{game}p{seat}", scheduler, revealed, accuracy, think_time,
+                               random.Random(rng.random()))
+            player.room, _ = lobby.join(player.connection, player.nickname)
+            played[player.room.room_id] = player.room
+    steps = run_until_idle(scheduler, clock)
+
+    results = {room_id: room.leaderboard.top(len(room.leaderboard))
+               for room_id, room in played.items() if room.state == rooms.FINISHED}
+    return results, clock.now, steps
+
+def simulate_shard(shard, games, questions, players_per_game, seed, accuracy, think_time):
+    # One shard of a larger run, with its own derived seed; keys are "shard:room".
+    rooms.LOG_EVENTS = False
+    results, virtual_seconds, steps = simulate(questions, games, players_per_game, f"{seed}:{shard}",
+                                               accuracy, think_time)
+    return {f"{shard}:{room_id}": standing for room_id, standing in results.items()}, virtual_seconds, steps
+
+def simulate_sharded(questions, games, players_per_game, seed=0, accuracy=0.7, think_time=(0.5, 15.0), jobs=1):
+    # Split a run into SHARD_GAMES-sized shards and play them on `jobs` processes.
+    shards = [(shard, min(SHARD_GAMES, games - start), questions, players_per_game, seed, accuracy, think_time)
+              for shard, start in enumerate(range(0, games, SHARD_GAMES))]
+    if jobs > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            parts = pool.starmap(simulate_shard, shards)
+    else:
+        parts = [simulate_shard(*shard) for shard in shards]
+
+    results = {}
+    for shard_results, _, _ in parts:
+        results.update(shard_results)
+    virtual_seconds = max((part[1] for part in parts), default=0.0)
+    steps = sum(part[2] for part in parts)
+    return results, virtual_seconds, steps
+
+def digest(results):
+    # Short fingerprint of all outcomes, to compare runs with the same seed.
+    blob = json.dumps(sorted(results.items()), separators=(',', ':')).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run complete quiz games in virtual time.")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=rooms.MAX_PLAYERS, help="players per game")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--accuracy', type=float, default=0.7)
+    parser.add_argument('--think-min', type=float, default=0.5)
+    parser.add_argument('--think-max', type=float, default=15.0)
+    parser.add_argument('--questions', default='questions.json')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as file:
+        questions = json.load(file)
+
+    start = time.perf_counter()
+    results, virtual_seconds, steps = simulate_sharded(questions, args.games, args.players, args.seed,
+                                                       args.accuracy, (args.think_min, args.think_max),
+                                                       args.jobs)
+    elapsed = time.perf_counter() - start
+
+    print(f"Games:        {len(results)} of {args.games} finished ({args.players} players each)")
+    print(f"Virtual time: {virtual_seconds:.1f} s in {steps} timer steps")
+    print(f"Wall time:    {elapsed:.3f} s ({len(results) / elapsed:.0f} games/s)")
+    print(f"Digest:       {digest(results)}")
+
+if __name__ == "__main__":
+    main()
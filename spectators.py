@@ -0,0 +1,88 @@
+import fanout
+import metrics
+import protocol
+
+# Read-only audience of a room.
+#
+# A spectator opens with SPECTATE instead of NICK. It is not a player: it has
+# no seat, never enters the room's broadcast loop and cannot answer. The room
+# hands its audience the few events worth watching (status, each question as
+# it opens, the final scores) and only tells it when the scores changed. The
+# scoreboard is rendered and sent at most once every SCORE_INTERVAL, however
+# many answers arrive in between, so the cost for the players does not grow
+# with the number of spectators.
+#
+# The latest frame of each CATCH_UP_TYPES type is kept, so a spectator who
+# arrives mid-game sees the current question and scores at once; a STATUS or
+# FINAL retires the question. After the final scores, or when a waiting room
+# is given up, the room closes every spectator connection. relay.py reuses the
+# same class to re-serve one upstream subscription to its own viewers, and
+# drops the feed when that upstream closes.
+
+SCORE_INTERVAL = 1.0    # Least seconds between scoreboard updates sent to spectators
+CATCH_UP_TYPES = (protocol.STATUS, protocol.QUESTION, protocol.SCORE, protocol.FINAL)
+DROPPABLE_TYPES = (protocol.STATUS, protocol.SCORE)     # Superseded by the next one anyway
+
+class Audience:
+
+    def __init__(self, scheduler, scoreboard=None, interval=SCORE_INTERVAL):
+        self.scheduler = scheduler
+        self.scoreboard = scoreboard    # Returns the current scoreboard text
+        self.interval = interval
+        self.viewers = set()
+        self.latest = {}                # Maps catch-up message types to their latest payload
+        self.timer = None               # Pending scoreboard update
+        self.last_update = None
+
+    def add(self, client):
+        # A new spectator: bring them up to date with one write.
+        self.viewers.add(client)
+        metrics.SPECTATORS.inc()
+        if self.scoreboard is not None and protocol.FINAL not in self.latest:
+            self.latest[protocol.SCORE] = self.scoreboard()
+        if self.latest:
+            client.send(protocol.encode_many(self.latest.items()))
+
+    def remove(self, client):
+        if client in self.viewers:
+            self.viewers.discard(client)
+            metrics.SPECTATORS.dec()
+
+    def publish(self, msg_type, payload):
+        # Send a message to every spectator; with nobody watching it is only remembered.
+        if msg_type in CATCH_UP_TYPES:
+            if msg_type in (protocol.STATUS, protocol.FINAL):
+                self.latest.pop(protocol.QUESTION, None)    # The question they follow is closed
+            self.latest[msg_type] = payload
+        if not self.viewers:
+            return
+        data = protocol.encode(msg_type, payload)
+        for client in fanout.fan_out(list(self.viewers), data, msg_type in DROPPABLE_TYPES):
+            self.remove(client)
+
+    def scores_changed(self):
+        # Schedule a scoreboard update, no sooner than SCORE_INTERVAL after the last one.
+        if self.timer is not None or self.scoreboard is None:
+            return
+        delay = 0
+        if self.last_update is not None:
+            delay = max(0, self.last_update + self.interval - self.scheduler.now())
+        self.timer = self.scheduler.call_later(delay, self.send_scores)
+
+    def send_scores(self):
+        self.timer = None
+        self.last_update = self.scheduler.now()
+        self.publish(protocol.SCORE, self.scoreboard())
+        metrics.SPECTATOR_UPDATES.inc()
+
+    def stop(self):
+        # No more updates are coming; a pending scoreboard would only follow the final one.
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+
+    def close(self):
+        # Disconnect every spectator, e.g. when the stream they watch has ended.
+        self.stop()
+        for client in list(self.viewers):
+            self.remove(client)
+            client.close()
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+from collections import deque
+
+import metrics
+import server
+from question_bank import ensure_built
+
+# The supervisor forks WORKERS processes that all accept on the game port, either
+# through SO_REUSEPORT (one listening socket per worker, balanced by the kernel) or
+# by inheriting one shared listening socket. Each worker runs its own event loop and
+# its own Lobby, so game rooms never span processes.
+#
+# Because the kernel picks the accepting worker at random, a coordinator in the
+# supervisor decides which worker owns the room currently being filled. A worker
+# asks it where each new connection belongs before reading a single byte; if the
+# answer is another worker, the socket is passed there over the coordinator's
+# Unix socket (SCM_RIGHTS) and the client never notices. A client that opens with
+# a RESUME token, or with SPECTATE for a room labelled "worker.room", skips the
+# coordinator and goes to the worker named in the token or label.
+COORDINATOR_PATH = '/tmp/quizzie-coordinator.sock'
+WORKERS = os.cpu_count() or 1
+MAX_FDS_PER_READ = 64
+
+LENGTH = struct.Struct("!I")
+
+class Channel:
+    # Length-prefixed JSON messages over a non-blocking Unix socket, optionally carrying a file descriptor.
+    # Frames the socket cannot take right away are queued; whoever polls the socket calls flush()
+    # once it is writable again, so neither the coordinator nor a worker's event loop ever blocks.
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.buffer = bytearray()
+        self.fds = deque()          # Descriptors received but not yet claimed by a message
+        self.outgoing = deque()     # [frame bytes, own copy of the descriptor or None] still to send
+
+    def send(self, message, fd=None):
+        # Queue a message and send what the socket takes now; returns False if some is left queued.
+        data = json.dumps(message).encode()
+        # The caller may close its descriptor as soon as this returns, so the queue holds a copy
+        self.outgoing.append([LENGTH.pack(len(data)) + data, None if fd is None else os.dup(fd)])
+        return self.flush()
+
+    def flush(self):
+        # Write queued frames until the socket would block; returns True once nothing is left.
+        while self.outgoing:
+            entry = self.outgoing[0]
+            frame, fd = entry
+            try:
+                if fd is None:
+                    sent = self.sock.send(frame)
+                else:
+                    # The descriptor rides along with the first byte of the frame
+                    sent = socket.send_fds(self.sock, [frame], [fd])
+            except BlockingIOError:
+                return False
+            if fd is not None:
+                os.close(fd)
+                entry[1] = None
+            if sent < len(frame):
+                entry[0] = frame[sent:]
+            else:
+                self.outgoing.popleft()
+        return True
+
+    def close(self):
+        for _, fd in self.outgoing:
+            if fd is not None:
+                os.close(fd)
+        self.outgoing.clear()
+        self.sock.close()
+
+    def receive(self):
+        # Read what is available; returns the complete messages, or None once the peer is gone.
+        try:
+            data, fds, flags, _ = socket.recv_fds(self.sock, 65536, MAX_FDS_PER_READ)
+        except BlockingIOError:
+            return []
+        if not data:
+            return None
+        if flags & socket.MSG_CTRUNC:
+            print("[COORDINATOR] Descriptors were truncated in transit; their messages are dropped.")
+        self.buffer += data
+        self.fds.extend(fds)
+        messages = []
+        while len(self.buffer) >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(self.buffer)
+            if len(self.buffer) < LENGTH.size + length:
+                break
+            message = json.loads(self.buffer[LENGTH.size:LENGTH.size + length])
+            del self.buffer[:LENGTH.size + length]
+            if message.get('fd'):
+                if not self.fds:
+                    print(f"[COORDINATOR] Dropping '{message['op']}' message whose descriptor did not arrive.")
+                    continue
+                message['fd'] = self.fds.popleft()
+            messages.append(message)
+        return messages
+
+class Coordinator:
+    # Runs in the supervisor: routes new players so each room fills on a single worker.
+
+    def __init__(self, path, room_size):
+        self.path = path
+        self.room_size = room_size
+        self.selector = selectors.DefaultSelector()
+        self.workers = {}       # Maps worker ids to their channels
+        self.order = []         # Worker ids in the order rooms are handed out
+        self.current = None     # Worker that owns the room being filled
+        self.filled = 0         # Players routed to the current worker for that room
+
+        if os.path.exists(path):
+            os.unlink(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+    def poll(self, timeout):
+        # Handle whatever worker traffic is ready, waiting at most timeout seconds.
+        for key, events in self.selector.select(timeout):
+            if key.fileobj is self.listener:
+                sock, _ = self.listener.accept()
+                self.selector.register(sock, selectors.EVENT_READ, Channel(sock))
+                continue
+            channel = key.data
+            if channel.sock.fileno() < 0:
+                continue    # Dropped earlier in this round
+            if events & selectors.EVENT_WRITE:
+                try:
+                    channel.flush()
+                except OSError:
+                    self.drop(channel)
+                    continue
+                self.watch_writes(channel)
+            if not events & selectors.EVENT_READ:
+                continue
+            try:
+                messages = channel.receive()
+            except OSError:
+                messages = None
+            if messages is None:
+                self.drop(channel)
+                continue
+            for message in messages:
+                self.dispatch(channel, message)
+
+    def send(self, channel, message, fd=None):
+        # Send to a worker; a worker that stopped reading only delays its own messages.
+        try:
+            channel.send(message, fd)
+        except OSError:
+            self.drop(channel)
+            return
+        self.watch_writes(channel)
+
+    def watch_writes(self, channel):
+        # Poll for writability only while the channel has queued output.
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if channel.outgoing else 0)
+        if self.selector.get_key(channel.sock).events != events:
+            self.selector.modify(channel.sock, events, channel)
+
+    def dispatch(self, channel, message):
+        op = message['op']
+        if op == 'hello':
+            worker = message['worker']
+            channel.worker = worker
+            self.workers[worker] = channel
+            self.order.append(worker)
+        elif op == 'route':
+            self.send(channel, {'op': 'routed', 'id': message['id'], 'worker': self.route()})
+        elif op == 'handoff':
+            fd = message['fd']
+            target = self.workers.get(message['worker'])
+            try:
+                if target is not None:
+                    self.send(target, {'op': 'adopt', 'fd': True, 'handshake_by': message['handshake_by']}, fd)
+            finally:
+                os.close(fd)
+
+    def route(self):
+        # Keep sending players to one worker until a room's worth has gone there.
+        if self.current not in self.workers or self.filled >= self.room_size:
+            if not self.order:
+                return None
+            if self.current in self.order:
+                position = (self.order.index(self.current) + 1) % len(self.order)
+            else:
+                position = 0
+            self.current = self.order[position]
+            self.filled = 0
+        self.filled += 1
+        return self.current
+
+    def drop(self, channel):
+        if channel.sock.fileno() < 0:
+            return
+        self.selector.unregister(channel.sock)
+        channel.close()
+        worker = getattr(channel, 'worker', None)
+        if self.workers.get(worker) is channel:
+            del self.workers[worker]
+            self.order.remove(worker)
+
+    def close_inherited(self):
+        # In a freshly forked worker: drop the supervisor's copies of these sockets.
+        for channel in self.workers.values():
+            channel.close()
+        self.listener.close()
+
+    def close(self):
+        self.selector.close()
+        self.listener.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class CoordinatorClient:
+    # Runs in a worker: asks the coordinator where sockets belong and adopts handed-off ones.
+
+    def __init__(self, path, worker_id):
+        self.worker_id = worker_id
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.channel = Channel(self.sock)
+        self.pending = {}       # Maps request ids to futures awaiting a routing answer
+        self.next_id = 0
+        self.on_adopt = None
+        self.channel.send({'op': 'hello', 'worker': worker_id})
+
+    def attach(self, on_adopt):
+        # Start listening on the running event loop; on_adopt(sock, handshake_by) gets handed-off clients.
+        self.on_adopt = on_adopt
+        asyncio.get_running_loop().add_reader(self.sock, self.on_readable)
+        self.watch_writes()
+
+    def send(self, message, fd=None):
+        if not self.channel.send(message, fd):
+            self.watch_writes()
+
+    def watch_writes(self):
+        # Have the event loop finish queued output once the socket can take it.
+        if self.channel.outgoing:
+            asyncio.get_running_loop().add_writer(self.sock, self.on_writable)
+
+    def on_writable(self):
+        try:
+            done = self.channel.flush()
+        except OSError:
+            done = True     # The reader notices the coordinator is gone
+        if done:
+            asyncio.get_running_loop().remove_writer(self.sock)
+
+    def on_readable(self):
+        try:
+            messages = self.channel.receive()
+        except OSError:
+            messages = None
+        if messages is None:
+            # Coordinator is gone; keep every new client locally from now on
+            asyncio.get_running_loop().remove_reader(self.sock)
+            for future in self.pending.values():
+                future.set_exception(ConnectionError("Coordinator closed"))
+            self.pending.clear()
+            return
+        for message in messages:
+            if message['op'] == 'routed':
+                future = self.pending.pop(message['id'], None)
+                if future is not None and not future.done():
+                    future.set_result(message['worker'])
+            elif message['op'] == 'adopt':
+                sock = socket.socket(fileno=message['fd'])
+                sock.setblocking(False)
+                self.on_adopt(sock, message['handshake_by'])
+
+    async def route(self):
+        # Ask which worker should own this connection.
+        self.next_id += 1
+        self.send({'op': 'route', 'id': self.next_id})
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        return await future
+
+    def hand_off(self, sock, worker, handshake_by):
+        # Pass an accepted, still unread client socket to another worker, with its handshake deadline.
+        # Workers share the machine's monotonic clock, so the deadline means the same time there.
+        self.send({'op': 'handoff', 'worker': worker, 'fd': True, 'handshake_by': handshake_by}, sock.fileno())
+
+def make_listener(reuse_port):
+    # Create the game port listener; with reuse_port every worker binds its own copy.
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    listener.bind((server.HOST, server.PORT))
+    listener.listen(server.LISTEN_BACKLOG)
+    listener.setblocking(False)
+    return listener
+
+def run_worker(worker_id, listener, reuse_port):
+    # Entry point of a forked worker process; never returns.
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    code = 0
+    try:
+        if listener is None:
+            listener = make_listener(reuse_port)
+        server.setup(worker_id)
+        coordinator = CoordinatorClient(COORDINATOR_PATH, worker_id)
+        print(f"[WORKER {worker_id}] pid {os.getpid()} accepting on {server.HOST}:{server.PORT}")
+        # Each worker serves its own metrics on consecutive ports
+        metrics_port = None if metrics.METRICS_PORT is None else metrics.METRICS_PORT + worker_id
+        asyncio.run(server.serve(listener, coordinator, metrics_port))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"[WORKER {worker_id}] crashed: {e}")
+        code = 1
+    finally:
+        server.shutdown()
+        sys.stdout.flush()
+        os._exit(code)
+
+def spawn(worker_id, listener, reuse_port, coordinator):
+    pid = os.fork()
+    if pid == 0:
+        coordinator.close_inherited()
+        run_worker(worker_id, listener, reuse_port)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the quiz server as several worker processes.")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="number of worker processes")
+    parser.add_argument('--no-reuseport', action='store_true',
+                        help="share one inherited listening socket instead of SO_REUSEPORT")
+    args = parser.parse_args()
+
+    reuse_port = hasattr(socket, 'SO_REUSEPORT') and not args.no_reuseport
+    # Make SIGTERM run the same cleanup as Ctrl+C so workers are not orphaned
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.raise_fd_limit()
+    if os.path.exists(server.QUESTIONS_FILE):
+        ensure_built(server.QUESTIONS_FILE, server.QUESTION_BANK)
+
+    # Workers inherit the shared listener when the kernel cannot balance for us
+    listener = None if reuse_port else make_listener(False)
+    coordinator = Coordinator(COORDINATOR_PATH, server.MAX_ROOM_PLAYERS)
+    workers = {}    # Maps pids to worker ids
+    for worker_id in range(args.workers):
+        workers[spawn(worker_id, listener, reuse_port, coordinator)] = worker_id
+    mode = "SO_REUSEPORT" if reuse_port else "a shared listening socket"
+    print(f"[SUPERVISOR] {args.workers} workers on {server.HOST}:{server.PORT} using {mode}")
+
+    try:
+        while True:
+            coordinator.poll(1)
+            # Replace any worker that died
+            while workers:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                worker_id = workers.pop(pid)
+                print(f"[SUPERVISOR] Worker {worker_id} exited ({status}); restarting.")
+                workers[spawn(worker_id, listener, reuse_port, coordinator)] = worker_id
+    except KeyboardInterrupt:
+        print("\n[SUPERVISOR] Shutting down.")
+    finally:
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        coordinator.close()
+
+if __name__ == "__main__":
+    main()
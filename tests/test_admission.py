@@ -0,0 +1,190 @@
+import asyncio
+import random
+import socket
+import unittest
+from unittest import mock
+
+import admission
+import latency
+import protocol
+import rooms
+import server
+from scheduler import Scheduler
+from sessions import SessionTable
+from simulation import MemoryBank
+
+QUESTIONS = [{'question': f"Q{n}?", 'A': "a", 'B': "b", 'C': "c", 'D': "d", 'answer': "A"} for n in range(5)]
+
+class RateLimitTest(unittest.TestCase):
+
+    def test_tracked_addresses_stay_capped(self):
+        now = [0.0]
+        gate = admission.Admission(clock=lambda: now[0])
+        with mock.patch.object(admission, 'MAX_TRACKED_IPS', 100):
+            for n in range(1000):
+                now[0] += 0.001
+                self.assertIsNone(gate.check(f"10.0.{n // 256}.{n % 256}"))
+                self.assertLessEqual(len(gate.buckets), 100)
+
+    def test_least_recently_seen_address_is_forgotten(self):
+        gate = admission.Admission(burst=1, rate=0, clock=lambda: 0.0)
+        with mock.patch.object(admission, 'MAX_TRACKED_IPS', 2):
+            self.assertIsNone(gate.check("10.0.0.1"))
+            self.assertIsNone(gate.check("10.0.0.2"))
+            self.assertEqual(gate.check("10.0.0.1"), admission.TOO_FAST)   # Now the most recently seen
+            self.assertIsNone(gate.check("10.0.0.3"))                       # Evicts 10.0.0.2
+            self.assertEqual(list(gate.buckets), ["10.0.0.1", "10.0.0.3"])
+
+class FakeCoordinator:
+    # Routes every other connection to worker 1 and records what it hands off.
+
+    worker_id = 0
+
+    def __init__(self):
+        self.routed = 0
+        self.handed = []
+
+    def attach(self, on_adopt):
+        self.on_adopt = on_adopt
+
+    async def route(self):
+        self.routed += 1
+        return self.routed % 2
+
+    def hand_off(self, sock, worker, handshake_by):
+        self.handed.append((socket.socket(fileno=socket.dup(sock.fileno())), handshake_by))
+
+class GateCountingTest(unittest.TestCase):
+    # The counters must return to zero on every path a connection can take.
+
+    def setUp(self):
+        rooms.LOG_EVENTS = False
+        scheduler = Scheduler()
+        patches = {
+            'scheduler': scheduler,
+            'gate': admission.Admission(),
+            'pinger': latency.Pinger(scheduler),
+            'lobby': rooms.Lobby(MemoryBank(QUESTIONS), scheduler, min_players=2, max_players=2,
+                                 questions_per_game=2, rng=random.Random(1), sessions=SessionTable(scheduler)),
+        }
+        for name, value in patches.items():
+            patcher = mock.patch.object(server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.gate = server.gate
+
+    def counts(self):
+        return self.gate.connections, self.gate.pending
+
+    async def settle(self):
+        await asyncio.sleep(0.05)
+
+    def run_async(self, coro):
+        asyncio.run(asyncio.wait_for(coro, 10))
+
+    async def start(self, coordinator=None):
+        # Serve on an ephemeral port: directly, or through the worker accept loop with a coordinator.
+        listener = socket.create_server(('127.0.0.1', 0))
+        listener.setblocking(False)
+        self.address = listener.getsockname()
+        if coordinator is None:
+            self.server = await asyncio.start_server(server.handle_client, sock=listener)
+            server.scheduler.attach(asyncio.get_running_loop())
+        else:
+            self.server = asyncio.create_task(server.serve(listener, coordinator, None))
+        await self.settle()
+
+    async def stop(self):
+        if isinstance(self.server, asyncio.Task):
+            self.server.cancel()
+        else:
+            self.server.close()
+        server.pinger.stop()
+        await self.settle()
+
+    async def connect(self, msg_type=None, payload=""):
+        reader, writer = await asyncio.open_connection(*self.address)
+        if msg_type is not None:
+            writer.write(protocol.encode(msg_type, payload))
+        await self.settle()
+        return reader, writer
+
+    def test_join_and_spectate(self):
+        async def run():
+            await self.start()
+            _, player = await self.connect(protocol.NICK, "p0")
+            self.assertEqual(self.counts(), (1, 0))
+            _, viewer = await self.connect(protocol.SPECTATE, "")
+            self.assertEqual(self.counts(), (2, 0))
+            _, idle = await self.connect()
+            self.assertEqual(self.counts(), (3, 1))
+            for writer in (player, viewer, idle):
+                writer.close()
+            await self.settle()
+            self.assertEqual(self.counts(), (0, 0))
+            await self.stop()
+        self.run_async(run())
+
+    def test_spectator_input_stays_capped(self):
+        async def run():
+            await self.start()
+            _, player = await self.connect(protocol.NICK, "p0")
+            _, viewer = await self.connect(protocol.SPECTATE, "")
+            viewer.write(protocol.HEADER.pack(protocol.PROTOCOL_VERSION, protocol.ANSWER,
+                                              admission.HANDSHAKE_MAX_PAYLOAD + 1))
+            await self.settle()
+            self.assertEqual(server.lobby.open_room.audience.viewers, set())
+            self.assertEqual(self.counts(), (1, 0))
+            player.close()
+            await self.stop()
+        self.run_async(run())
+
+    def test_handshake_expiry(self):
+        async def run():
+            with mock.patch.object(admission, 'HANDSHAKE_TIMEOUT', 0.1):
+                await self.start()
+                reader, _ = await self.connect()
+                self.assertEqual(self.counts(), (1, 1))
+                self.assertEqual(await reader.read(), b"")
+                await self.settle()
+                self.assertEqual(self.counts(), (0, 0))
+                await self.stop()
+        self.run_async(run())
+
+    def test_routed_handshake_expiry(self):
+        async def run():
+            with mock.patch.object(admission, 'HANDSHAKE_TIMEOUT', 0.1):
+                await self.start(FakeCoordinator())
+                reader, _ = await self.connect()
+                self.assertEqual(self.counts(), (1, 1))     # Counted while its first frame is awaited
+                await reader.read()
+                await self.settle()
+                self.assertEqual(self.counts(), (0, 0))
+                await self.stop()
+        self.run_async(run())
+
+    def test_hand_off(self):
+        async def run():
+            coordinator = FakeCoordinator()
+            await self.start(coordinator)
+            handed = await self.connect(protocol.NICK, "handed")    # Routed to worker 1
+            self.assertEqual(len(coordinator.handed), 1)
+            self.assertEqual(self.counts(), (0, 0))
+            kept = await self.connect(protocol.NICK, "kept")        # Routed to worker 0
+            self.assertEqual(self.counts(), (1, 0))
+
+            # What the receiving worker does with the socket it was passed
+            sock, handshake_by = coordinator.handed[0]
+            sock.setblocking(False)
+            server.adopt_client(sock, handshake_by)
+            await self.settle()
+            self.assertEqual(self.counts(), (2, 0))
+            for _, writer in (handed, kept):
+                writer.close()
+            await self.settle()
+            self.assertEqual(self.counts(), (0, 0))
+            await self.stop()
+        self.run_async(run())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import journal
+import rooms
+from scheduler import Scheduler
+from sessions import SessionTable
+from simulation import MemoryBank, VirtualClock
+
+QUESTIONS = [{'question': f"Q{n}?", 'A': "a", 'B': "b", 'C': "c", 'D': "d", 'answer': "A"} for n in range(5)]
+PLAYERS = ("p0", "p1", "p2")
+
+class Connection:
+    # Minimal stand-in for fanout.ClientConnection; the journal tests only need a sink.
+
+    def __init__(self, name):
+        self.peer = ('test', name)
+        self.closed = False
+        self.evicted = False
+        self.link = None
+
+    def send(self, data, droppable=False):
+        return not self.closed
+
+    def queue_depth(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+class Server:
+    # One incarnation of the server: a lobby journaling into the shared files.
+
+    def __init__(self, path, snapshot_path, valid_end=None):
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+        self.journal = journal.Journal(path, snapshot_path, flush_interval=3600, valid_end=valid_end)
+        self.lobby = rooms.Lobby(MemoryBank(QUESTIONS), self.scheduler, min_players=len(PLAYERS),
+                                 max_players=len(PLAYERS), questions_per_game=3, rng=random.Random(1),
+                                 sessions=SessionTable(self.scheduler, journal=self.journal), journal=self.journal)
+
+    def step_until(self, condition):
+        while not condition():
+            self.clock.advance_to(self.scheduler.next_deadline())
+            self.scheduler.run_due(self.clock.now)
+
+    def room_state(self):
+        # What a snapshot taken now would hold for the one room.
+        state, = self.lobby.journal_state()['rooms']
+        return state
+
+class RecoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        rooms.LOG_EVENTS = False
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'journal.log')
+        self.snapshot_path = os.path.join(directory, 'journal.snapshot')
+        self.server = Server(self.path, self.snapshot_path)
+        self.addCleanup(self.server.journal.close)
+        self.clients = {}
+        for name in PLAYERS:
+            client = Connection(name)
+            room, nickname = self.server.lobby.join(client, name)
+            self.server.lobby.sessions.open(room, nickname, client)
+            self.clients[name] = client
+        self.room = room
+
+    def open_question(self, index):
+        self.server.step_until(lambda: self.room.answered is not None and self.room.question_index == index)
+
+    def answer(self, name, choice):
+        self.room.record_answer(self.clients[name], choice)
+
+    def recover(self):
+        self.server.journal.flush()
+        return journal.recover(self.path, self.snapshot_path)
+
+    def test_torn_tail_is_dropped(self):
+        self.open_question(0)
+        self.answer("p0", "A")
+        self.answer("p1", "B")
+        expected = self.server.room_state()
+        self.server.journal.flush()
+        valid_size = os.path.getsize(self.path)
+        with open(self.path, 'ab') as file:
+            file.write(b'{"t":1,"e":"answer","room":1,"ni')     # Cut short by a crash
+
+        running, last_room_id, offset = journal.recover(self.path, self.snapshot_path)
+        self.assertEqual(offset, valid_size)
+        self.assertEqual(last_room_id, 1)
+        self.assertEqual(running, [expected])
+        self.assertEqual(expected['answers'], {"p0": "A", "p1": "B"})
+        self.assertEqual(set(expected['tokens']), set(PLAYERS))
+
+        # The next incarnation cuts the torn record off before appending
+        journal.Journal(self.path, self.snapshot_path, valid_end=offset).close()
+        self.assertEqual(os.path.getsize(self.path), valid_size)
+
+    def test_snapshot_plus_tail(self):
+        self.open_question(0)
+        self.answer("p0", "A")
+        self.server.journal.snapshot(self.server.lobby.journal_state())
+        self.server.journal.flush()
+        covered = os.path.getsize(self.path)
+
+        self.answer("p1", "A")
+        self.open_question(1)
+        self.answer("p2", "A")
+        expected = self.server.room_state()
+
+        # Records the snapshot covers must not be replayed; garble them to prove it
+        self.server.journal.flush()
+        with open(self.path, 'r+b') as file:
+            file.write(b"#" * covered)
+        running, last_room_id, _ = journal.recover(self.path, self.snapshot_path)
+        self.assertEqual(running, [expected])
+        self.assertEqual(expected['index'], 1)
+        self.assertEqual(expected['answers'], {"p2": "A"})
+        self.assertEqual(expected['scores'], {"p0": 1, "p1": 1, "p2": 1})
+
+    def test_resumed_question_keeps_answers(self):
+        self.open_question(0)
+        self.answer("p0", "A")
+        tokens = self.server.room_state()['tokens']
+        running, last_room_id, offset = self.recover()
+        self.server.journal.close()
+
+        # Restart: the recovered room asks question 0 again and p0 may not answer twice
+        restarted = Server(self.path, self.snapshot_path, valid_end=offset)
+        self.addCleanup(restarted.journal.close)
+        restarted.lobby.restore(running, last_room_id)
+        room = restarted.lobby.rooms[1]
+        self.assertEqual(room.question_index, 0)
+        resumed = {}
+        for name in PLAYERS:
+            resumed[name] = Connection(f"{name} again")
+            self.assertIs(restarted.lobby.resume(resumed[name], tokens[name]), room)
+        room.record_answer(resumed["p0"], "B")     # Already answered before the crash
+        room.record_answer(resumed["p1"], "A")
+        restarted.journal.flush()
+
+        running, _, _ = journal.recover(self.path, self.snapshot_path)
+        state, = running
+        self.assertEqual(state, restarted.room_state())
+        self.assertEqual(state['answers'], {"p0": "A", "p1": "A"})
+        self.assertEqual(state['scores'], {"p0": 1, "p1": 1, "p2": 0})
+        self.assertEqual(state['tokens'], tokens)
+
+if __name__ == "__main__":
+    unittest.main()
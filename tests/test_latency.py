@@ -0,0 +1,61 @@
+import unittest
+
+import latency
+import protocol
+from scheduler import Scheduler
+from simulation import VirtualClock
+
+class Link:
+    # Connection stand-in whose sends can be refused like a droppable frame behind a backlog.
+
+    def __init__(self):
+        self.peer = ('test', 'link')
+        self.closed = False
+        self.link = None
+        self.lagging = False
+        self.pings = []
+
+    def send(self, data, droppable=False):
+        if self.lagging and droppable:
+            return False
+        (msg_type, payload), = protocol.FrameDecoder().feed(data)
+        self.pings.append(payload)
+        return True
+
+    def queue_depth(self):
+        return 0
+
+class PingerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(100.0)
+        self.scheduler = Scheduler(self.clock)
+        self.pinger = latency.Pinger(self.scheduler, wall_clock=lambda: 1000.0 + self.clock.now)
+        self.client = Link()
+
+    def tick_at(self, now):
+        self.clock.advance_to(now)
+        self.pinger.tick()
+
+    def test_dropped_ping_is_retried_on_the_next_tick(self):
+        self.client.lagging = True
+        self.pinger.add(self.client)
+        self.assertIsNone(self.client.link.sent_at)
+        self.client.lagging = False
+        self.tick_at(100.0 + latency.PING_INTERVAL)
+        self.assertEqual(self.client.pings, ["1"])
+
+        self.clock.advance_to(self.clock.now + 0.04)
+        self.pinger.pong(self.client, f"1 {1000.0 + self.clock.now - 0.02:.6f}")
+        self.assertAlmostEqual(self.client.link.rtt, 0.04)
+        self.assertAlmostEqual(self.client.link.offset, 0.0)
+
+    def test_outstanding_ping_is_not_repeated(self):
+        self.pinger.add(self.client)
+        self.tick_at(100.0 + latency.PING_INTERVAL)
+        self.assertEqual(self.client.pings, ["1"])
+        self.tick_at(100.0 + latency.PING_TIMEOUT + 1)
+        self.assertEqual(self.client.pings, ["1", "2"])
+
+if __name__ == "__main__":
+    unittest.main()
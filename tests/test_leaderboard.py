@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from leaderboard import Leaderboard
+
+class LeaderboardTest(unittest.TestCase):
+    # Every query is checked against a brute-force sort of the same scores.
+
+    def check(self, board, scores):
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        for k in (0, 1, 3, 10, len(scores) + 1):
+            self.assertEqual(board.top(k), ranked[:k])
+        for nickname, score in scores.items():
+            self.assertEqual(board.rank(nickname), 1 + sum(other > score for other in scores.values()))
+        best = max(scores.values(), default=None)
+        self.assertEqual(board.leaders(), sorted(n for n, s in scores.items() if s == best))
+        self.assertEqual(len(board), len(scores))
+
+    def test_against_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            board, scores = Leaderboard(), {}
+            for step in range(rng.randint(0, 80)):
+                action = rng.random()
+                if action < 0.4 or not scores:
+                    nickname = f"p{step}"
+                    scores[nickname] = rng.randint(0, 3)
+                    board.add(nickname, scores[nickname])
+                elif action < 0.9:
+                    nickname = rng.choice(sorted(scores))
+                    points = rng.randint(0, 40)     # Past the Fenwick tree's initial size
+                    scores[nickname] += points
+                    self.assertEqual(board.add_points(nickname, points), scores[nickname])
+                else:
+                    nickname = rng.choice(sorted(scores))
+                    del scores[nickname]
+                    board.remove(nickname)
+            self.check(board, scores)
+
+if __name__ == "__main__":
+    unittest.main()
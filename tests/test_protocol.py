@@ -0,0 +1,50 @@
+import unittest
+
+import protocol
+
+class FrameDecoderTest(unittest.TestCase):
+
+    def test_frame_split_across_reads(self):
+        data = protocol.encode(protocol.NICK, "alice")
+        decoder = protocol.FrameDecoder()
+        for n in range(len(data) - 1):
+            self.assertEqual(decoder.feed(data[n:n + 1]), [])
+        self.assertEqual(decoder.feed(data[-1:]), [(protocol.NICK, "alice")])
+        self.assertEqual(decoder.buffer, b"")
+
+    def test_several_frames_in_one_read(self):
+        messages = [(protocol.STATUS, "waiting"), (protocol.SCORE, ""), (protocol.FINAL, "done")]
+        data = protocol.encode_many(messages) + protocol.encode(protocol.RANK, "1st")[:4]
+        decoder = protocol.FrameDecoder()
+        self.assertEqual(decoder.feed(data), messages)
+        self.assertEqual(decoder.feed(protocol.encode(protocol.RANK, "1st")[4:]), [(protocol.RANK, "1st")])
+
+    def test_multibyte_character_split_across_reads(self):
+        data = protocol.encode(protocol.STATUS, "Soru 1 ⏳ Şimdi")
+        cut = data.index("⏳".encode()) + 1    # Inside the three-byte character
+        decoder = protocol.FrameDecoder()
+        self.assertEqual(decoder.feed(data[:cut]), [])
+        self.assertEqual(decoder.feed(data[cut:]), [(protocol.STATUS, "Soru 1 ⏳ Şimdi")])
+
+    def test_bad_version(self):
+        data = protocol.HEADER.pack(protocol.PROTOCOL_VERSION + 1, protocol.NICK, 1) + b"x"
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.FrameDecoder().feed(data)
+
+    def test_oversized_frame(self):
+        # Refused from the header alone, before any of the payload is buffered
+        header = protocol.HEADER.pack(protocol.PROTOCOL_VERSION, protocol.NICK, protocol.MAX_PAYLOAD + 1)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.FrameDecoder().feed(header)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.FrameDecoder(max_payload=16).feed(protocol.encode(protocol.NICK, "x" * 17))
+        self.assertEqual(protocol.FrameDecoder(max_payload=16).feed(protocol.encode(protocol.NICK, "x" * 16)),
+                         [(protocol.NICK, "x" * 16)])
+
+    def test_invalid_utf8(self):
+        data = protocol.HEADER.pack(protocol.PROTOCOL_VERSION, protocol.NICK, 2) + b"\xff\xfe"
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.FrameDecoder().feed(data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+import protocol
+import rooms
+from scheduler import Scheduler
+from sessions import SessionTable
+from simulation import MemoryBank, VirtualClock
+
+QUESTIONS = [{'question': f"Q{n}?", 'A': "a", 'B': "b", 'C': "c", 'D': "d", 'answer': "A"} for n in range(5)]
+
+class FakeConnection:
+    # Stand-in for fanout.ClientConnection that records frames and can be made to fail like an eviction.
+
+    def __init__(self, name):
+        self.peer = ('test', name)
+        self.frames = []
+        self.fail = False
+        self.closed = False
+        self.evicted = False
+        self.link = None
+
+    def send(self, data, droppable=False):
+        if self.closed:
+            return False
+        if self.fail:
+            self.evicted = True
+            self.close()
+            return False
+        self.frames.append(data)
+        return True
+
+    def queue_depth(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+    def types(self):
+        decoder = protocol.FrameDecoder()
+        return [msg_type for data in self.frames for msg_type, _ in decoder.feed(data)]
+
+def run_until_idle(scheduler, clock):
+    while scheduler.next_deadline() is not None:
+        clock.advance_to(scheduler.next_deadline())
+        scheduler.run_due(clock.now)
+
+class ResumeAfterEvictionTest(unittest.TestCase):
+
+    def setUp(self):
+        rooms.LOG_EVENTS = False
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+        self.lobby = rooms.Lobby(MemoryBank(QUESTIONS), self.scheduler, min_players=2, max_players=2,
+                                 questions_per_game=2, rng=random.Random(1),
+                                 sessions=SessionTable(self.scheduler))
+        self.players = {}
+        for name in ("p0", "p1"):
+            client = FakeConnection(name)
+            room, nickname = self.lobby.join(client, name)
+            self.players[name] = (client, self.lobby.sessions.open(room, nickname, client))
+        self.room = room
+
+    def test_evicted_player_can_resume(self):
+        client, token = self.players["p0"]
+        self.assertEqual(self.room.state, rooms.RUNNING)
+        client.fail = True
+        self.room.broadcast(protocol.SCORE, "scores")
+        self.assertIn("p0", self.room.away)
+
+        # What handle_client does once the evicted connection's read loop ends
+        self.lobby.leave(self.room, client, token)
+
+        new_client = FakeConnection("p0 again")
+        self.assertIs(self.lobby.resume(new_client, token), self.room)
+        self.assertEqual(self.room.clients[new_client], "p0")
+        self.assertIn(protocol.SNAPSHOT, new_client.types())
+
+        run_until_idle(self.scheduler, self.clock)
+        self.assertEqual(self.room.state, rooms.FINISHED)
+        self.assertIn(protocol.FINAL, new_client.types())
+
+    def test_resume_without_a_seat_is_refused(self):
+        client, token = self.players["p0"]
+        self.room.remove_player(client)
+
+        new_client = FakeConnection("p0 again")
+        self.assertIsNone(self.lobby.resume(new_client, token))
+        self.assertNotIn(new_client, self.room.clients)
+        self.assertIsNone(self.lobby.sessions.get(token))
+
+        run_until_idle(self.scheduler, self.clock)
+        self.assertEqual(self.room.state, rooms.FINISHED)
+
+class SpectatorTest(unittest.TestCase):
+
+    def setUp(self):
+        rooms.LOG_EVENTS = False
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+        self.lobby = rooms.Lobby(MemoryBank(QUESTIONS), self.scheduler, min_players=2, max_players=2,
+                                 questions_per_game=2, rng=random.Random(1))
+
+    def test_spectators_are_closed_after_the_final_scores(self):
+        player = FakeConnection("p0")
+        room, _ = self.lobby.join(player, "p0")
+        spectator = FakeConnection("viewer")
+        self.assertIs(self.lobby.spectate(spectator, ""), room)
+        self.lobby.join(FakeConnection("p1"), "p1")
+
+        run_until_idle(self.scheduler, self.clock)
+        self.assertEqual(room.state, rooms.FINISHED)
+        self.assertEqual(spectator.types()[-1], protocol.FINAL)
+        self.assertTrue(spectator.closed)
+        self.assertFalse(room.audience.viewers)
+        self.assertIsNone(self.lobby.spectate(FakeConnection("late"), str(room.room_id)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import asyncio
+import contextlib
+import io
+import unittest
+
+from scheduler import Scheduler
+from simulation import VirtualClock
+
+class FailingCallbackTest(unittest.TestCase):
+
+    def test_other_timers_still_run(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        fired = []
+
+        def broken():
+            raise RuntimeError("boom")
+
+        scheduler.call_at(1, fired.append, "before")
+        scheduler.call_at(1, broken)
+        scheduler.call_at(1, fired.append, "after")
+        scheduler.call_at(2, fired.append, "later")
+        clock.advance_to(1)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) as log:
+            self.assertEqual(scheduler.run_due(), 3)
+        self.assertEqual(fired, ["before", "after"])
+        self.assertIn("RuntimeError: boom", log.getvalue())
+        self.assertEqual(scheduler.next_deadline(), 2)
+
+    def test_loop_timer_is_rearmed(self):
+        fired = []
+
+        async def run():
+            scheduler = Scheduler()
+            scheduler.attach(asyncio.get_running_loop())
+            scheduler.call_later(0, lambda: 1 / 0)
+            scheduler.call_later(0.01, fired.append, "next")
+            await asyncio.sleep(0.05)
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            asyncio.run(run())
+        self.assertEqual(fired, ["next"])
+
+if __name__ == "__main__":
+    unittest.main()
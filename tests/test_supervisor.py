@@ -0,0 +1,57 @@
+import contextlib
+import io
+import json
+import os
+import socket
+import unittest
+
+import supervisor
+
+class ChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sender = supervisor.Channel(left)
+        self.receiver = supervisor.Channel(right)
+        self.addCleanup(self.sender.close)
+        self.addCleanup(self.receiver.close)
+
+    def receive_all(self):
+        messages = []
+        while True:
+            batch = self.receiver.receive()
+            if not batch:
+                return messages
+            messages.extend(batch)
+
+    def test_message_without_its_descriptor_is_dropped(self):
+        data = json.dumps({'op': 'handoff', 'worker': 1, 'fd': True}).encode()
+        self.sender.sock.send(supervisor.LENGTH.pack(len(data)) + data)
+        self.sender.send({'op': 'route', 'id': 7})
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            self.assertEqual(self.receive_all(), [{'op': 'route', 'id': 7}])
+        self.assertIn("did not arrive", log.getvalue())
+
+    def test_send_queues_instead_of_blocking(self):
+        read_end, write_end = os.pipe()
+        self.addCleanup(os.close, read_end)
+        padding = "x" * 4096
+        sent = 0
+        while self.sender.send({'op': 'route', 'id': sent, 'pad': padding}):
+            sent += 1
+        self.sender.send({'op': 'adopt', 'fd': True}, write_end)
+        os.close(write_end)     # The channel keeps its own copy until the frame is out
+        self.assertTrue(self.sender.outgoing)
+
+        messages = []
+        while self.sender.outgoing or not messages or messages[-1]['op'] != 'adopt':
+            self.sender.flush()
+            messages.extend(self.receive_all())
+        self.assertEqual([m['id'] for m in messages[:-1]], list(range(sent + 1)))
+        adopted = messages[-1]['fd']
+        os.write(adopted, b"ok")
+        os.close(adopted)
+        self.assertEqual(os.read(read_end, 2), b"ok")
+
+if __name__ == "__main__":
+    unittest.main()